@@ -0,0 +1,10 @@
+from pathlib import Path
+
+from fastapi.templating import Jinja2Templates
+
+APP_ROOT = Path(__file__).resolve().parents[1]
+TEMPLATES_DIR = APP_ROOT / "templates"
+
+# Shared by main and the route modules so every page renders from one
+# Jinja environment (and one compiled-template cache).
+templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
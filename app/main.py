@@ -1,4 +1,5 @@
 
+import asyncio
 import logging
 from datetime import date, datetime, timedelta, timezone
 from pathlib import Path
@@ -10,7 +11,6 @@ from fastapi.responses import FileResponse, HTMLResponse, JSONResponse, Redirect
 
 logger = logging.getLogger(__name__)
 from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 from sqlalchemy import case, text
@@ -34,6 +34,7 @@ from app.routes.payments import router as payments_router
 from app.routes.public import router as public_router
 from app.logic.negotiator import handle_broker_reply
 from app.core.config import settings as core_settings
+from app.core.templates import APP_ROOT, templates
 from app.services.email import send_outbound_email, send_quick_reply_email
 from app.services.document_registry import get_active_documents
 from app.services.packet_manager import log_packet_snapshot, register_uploaded_packet_document
@@ -90,11 +91,8 @@ class Settings(BaseSettings):
 
 settings = Settings()
 logger = logging.getLogger(__name__)
-app_root = Path(__file__).resolve().parent
-templates_dir = Path(__file__).resolve().parent / "templates"
 app = FastAPI(title=settings.app_name)
-app.mount("/static", StaticFiles(directory=str(app_root / "static")), name="static")
-templates = Jinja2Templates(directory=str(templates_dir))
+app.mount("/static", StaticFiles(directory=str(APP_ROOT / "static")), name="static")
 env_lower = (settings.app_env or "").strip().lower()
 session_https_only = env_lower in {"production", "prod"}
 app.add_middleware(
@@ -1188,6 +1186,81 @@ async def approve_draft_send(
     return {"status": "ok", "message": "draft_approved_and_sent"}
 
 
+# Dry runs force review_before_send on and restore it afterwards. Overlapping
+# simulations would restore it under each other and let a "dry run" really
+# send, so they take turns (the app runs as a single uvicorn process).
+_SIMULATE_BROKER_LOCK = asyncio.Lock()
+
+
+async def _simulate_broker_messages(
+    negotiation: Negotiation,
+    driver: Driver,
+    message_texts: list[str],
+    dry_run: bool,
+    db: Session,
+) -> list[dict]:
+    async with _SIMULATE_BROKER_LOCK:
+        db.refresh(driver)
+        return await _run_simulated_messages(negotiation, driver, message_texts, dry_run, db)
+
+
+async def _run_simulated_messages(
+    negotiation: Negotiation,
+    driver: Driver,
+    message_texts: list[str],
+    dry_run: bool,
+    db: Session,
+) -> list[dict]:
+    original_review_before_send = bool(getattr(driver, "review_before_send", False))
+
+    if dry_run:
+        driver.review_before_send = True
+        db.commit()
+
+    results: list[dict] = []
+    try:
+        for message_text in message_texts:
+            action_taken = await handle_broker_reply(
+                negotiation,
+                message_text,
+                driver,
+                db,
+            )
+            db.refresh(negotiation)
+            latest_message = (
+                db.query(Message)
+                .filter(Message.negotiation_id == negotiation.id)
+                .order_by(Message.id.desc())
+                .first()
+            )
+            results.append(
+                {
+                    "action_taken": action_taken,
+                    "pending_review_action": negotiation.pending_review_action,
+                    "pending_review_price": float(negotiation.pending_review_price) if negotiation.pending_review_price is not None else None,
+                    "latest_message": latest_message.body if latest_message else None,
+                }
+            )
+    finally:
+        if dry_run:
+            driver.review_before_send = original_review_before_send
+            db.commit()
+
+    return results
+
+
+def _simulate_broker_target(negotiation_id: int, db: Session) -> tuple[Negotiation | None, Driver | None, str | None]:
+    negotiation = db.query(Negotiation).filter(Negotiation.id == negotiation_id).first()
+    if not negotiation:
+        return None, None, "negotiation_not_found"
+
+    driver = db.query(Driver).filter(Driver.id == negotiation.driver_id).first()
+    if not driver:
+        return negotiation, None, "driver_not_found"
+
+    return negotiation, driver, None
+
+
 @app.post("/api/test/simulate-broker")
 async def simulate_broker_reply(
     negotiation_id: int = Form(...),
@@ -1199,47 +1272,45 @@ async def simulate_broker_reply(
     if settings.app_env != "development" and not _admin_authorized(admin_password):
         return {"status": "error", "message": "forbidden"}
 
-    negotiation = db.query(Negotiation).filter(Negotiation.id == negotiation_id).first()
-    if not negotiation:
-        return {"status": "error", "message": "negotiation_not_found"}
+    negotiation, driver, error = _simulate_broker_target(negotiation_id, db)
+    if error:
+        return {"status": "error", "message": error}
 
-    driver = db.query(Driver).filter(Driver.id == negotiation.driver_id).first()
-    if not driver:
-        return {"status": "error", "message": "driver_not_found"}
+    (result,) = await _simulate_broker_messages(negotiation, driver, [message_text], dry_run, db)
 
-    original_review_before_send = bool(getattr(driver, "review_before_send", False))
+    return {
+        "status": "ok",
+        "action_taken": result["action_taken"],
+        "dry_run": dry_run,
+        "negotiation_id": negotiation.id,
+        "pending_review_action": result["pending_review_action"],
+        "pending_review_price": result["pending_review_price"],
+        "latest_message": result["latest_message"],
+    }
 
-    if dry_run:
-        driver.review_before_send = True
-        db.commit()
 
-    try:
-        action_taken = await handle_broker_reply(
-            negotiation,
-            message_text,
-            driver,
-            db,
-        )
-        db.refresh(negotiation)
-        latest_message = (
-            db.query(Message)
-            .filter(Message.negotiation_id == negotiation.id)
-            .order_by(Message.id.desc())
-            .first()
-        )
-    finally:
-        if dry_run:
-            driver.review_before_send = original_review_before_send
-            db.commit()
+@app.post("/api/test/simulate-broker-batch")
+async def simulate_broker_reply_batch(
+    negotiation_id: int = Form(...),
+    message_text: list[str] = Form(...),
+    dry_run: bool = Form(default=True),
+    admin_password: str | None = Form(default=None),
+    db: Session = Depends(get_db),
+):
+    if settings.app_env != "development" and not _admin_authorized(admin_password):
+        return {"status": "error", "message": "forbidden"}
+
+    negotiation, driver, error = _simulate_broker_target(negotiation_id, db)
+    if error:
+        return {"status": "error", "message": error}
+
+    results = await _simulate_broker_messages(negotiation, driver, message_text, dry_run, db)
 
     return {
         "status": "ok",
-        "action_taken": action_taken,
         "dry_run": dry_run,
         "negotiation_id": negotiation.id,
-        "pending_review_action": negotiation.pending_review_action,
-        "pending_review_price": float(negotiation.pending_review_price) if negotiation.pending_review_price is not None else None,
-        "latest_message": latest_message.body if latest_message else None,
+        "results": results,
     }
 
 
@@ -3,6 +3,7 @@ Billing repository — all DB reads/writes for the weekly billing job.
 Uses SQLAlchemy text() + Session, matching the existing codebase pattern.
 """
 import logging
+from dataclasses import dataclass
 from datetime import date, datetime
 from decimal import Decimal
 from typing import Any
@@ -17,41 +18,73 @@ logger = logging.getLogger(__name__)
 # Pending invoice queries
 # ---------------------------------------------------------------------------
 
-def get_pending_invoices_grouped_by_driver(
+@dataclass
+class PendingDriverBilling:
+    """One driver's pending invoices plus the context the billing job needs."""
+    driver_id: int
+    invoice_ids: list[int]
+    total_cents: int
+    driver_info: dict[str, Any]
+    existing_run: dict[str, Any] | None
+
+
+def get_pending_billing_context(
     db: Session,
     up_to_week_ending: date,
-) -> dict[int, list[dict[str, Any]]]:
+) -> list[PendingDriverBilling]:
     """
     Returns all pending driver_invoices with no billed_week_ending yet,
-    grouped by driver_id. Only includes drivers whose billing_state = 'active'.
+    grouped by driver_id, together with each driver's Stripe/billing fields
+    and any existing billing_run for the week — one round trip for the job.
+    Only includes drivers whose billing_state = 'active'.
     """
     rows = db.execute(
         text("""
             SELECT
-                di.id,
-                di.driver_id,
-                di.negotiation_id,
-                di.gross_amount_cents,
-                di.fee_amount_cents,
-                di.fee_rate,
-                di.status,
-                di.created_at
+                d.id AS driver_id,
+                d.stripe_customer_id,
+                d.stripe_default_payment_method_id,
+                d.billing_state,
+                d.stripe_payment_status,
+                d.billing_mode,
+                d.billing_exempt_until,
+                d.billing_exempt_reason,
+                br.id AS run_id,
+                br.status AS run_status,
+                array_agg(di.id ORDER BY di.created_at) AS invoice_ids,
+                SUM(di.fee_amount_cents)::bigint AS total_cents
             FROM public.driver_invoices di
             JOIN public.drivers d ON d.id = di.driver_id
+            LEFT JOIN public.billing_runs br
+                ON br.driver_id = d.id AND br.week_ending = :up_to
             WHERE di.status = 'pending'
               AND di.billed_week_ending IS NULL
               AND di.created_at::date <= :up_to
               AND d.billing_state = 'active'
-            ORDER BY di.driver_id, di.created_at
+            GROUP BY d.id, br.id
+            ORDER BY d.id
         """),
         {"up_to": up_to_week_ending},
     ).mappings().all()
 
-    grouped: dict[int, list[dict[str, Any]]] = {}
+    result: list[PendingDriverBilling] = []
     for row in rows:
         r = dict(row)
-        grouped.setdefault(r["driver_id"], []).append(r)
-    return grouped
+        run_id = r.pop("run_id")
+        run_status = r.pop("run_status")
+        invoice_ids = r.pop("invoice_ids")
+        total_cents = r.pop("total_cents")
+        r["id"] = r.pop("driver_id")
+        result.append(
+            PendingDriverBilling(
+                driver_id=r["id"],
+                invoice_ids=list(invoice_ids),
+                total_cents=int(total_cents),
+                driver_info=r,
+                existing_run={"id": run_id, "status": run_status} if run_id is not None else None,
+            )
+        )
+    return result
 
 
 def has_payment_method(driver_info: dict[str, Any] | None) -> bool:
@@ -178,8 +211,9 @@ def create_billing_run(
     dry_run: bool = False,
 ) -> int:
     """
-    Insert a billing_run row. Returns the new run id.
-    Uses INSERT ... ON CONFLICT DO NOTHING to be idempotent on the unique key.
+    Insert a billing_run row, or reuse the existing one. Returns the run id.
+    The no-op DO UPDATE makes RETURNING yield the existing row on conflict,
+    so the idempotency check needs no second SELECT.
     Raises if a successful run already exists for this (driver_id, week_ending).
     """
     status = "dry_run" if dry_run else "pending"
@@ -188,8 +222,9 @@ def create_billing_run(
             INSERT INTO public.billing_runs
                 (driver_id, week_ending, status, total_amount_cents)
             VALUES (:driver_id, :week_ending, :status, :total_amount_cents)
-            ON CONFLICT (driver_id, week_ending) DO NOTHING
-            RETURNING id
+            ON CONFLICT (driver_id, week_ending)
+                DO UPDATE SET updated_at = CURRENT_TIMESTAMP
+            RETURNING id, status
         """),
         {
             "driver_id": driver_id,
@@ -197,16 +232,12 @@ def create_billing_run(
             "status": status,
             "total_amount_cents": total_amount_cents,
         },
-    ).mappings().first()
+    ).mappings().one()
 
-    if row is None:
-        # Row already existed — fetch it
-        existing = get_billing_run(db, driver_id, week_ending)
-        if existing and existing["status"] == "success":
-            raise ValueError(
-                f"Billing run for driver {driver_id} week {week_ending} already succeeded — skipping."
-            )
-        return existing["id"]  # type: ignore[index]
+    if row["status"] == "success":
+        raise ValueError(
+            f"Billing run for driver {driver_id} week {week_ending} already succeeded — skipping."
+        )
 
     return row["id"]
 
@@ -223,7 +254,7 @@ def attach_invoices_to_run(
     db.execute(
         text("""
             INSERT INTO public.billing_run_items (billing_run_id, driver_invoice_id)
-            SELECT :run_id, unnest(:invoice_ids::int[])
+            SELECT :run_id, unnest(CAST(:invoice_ids AS int[]))
             ON CONFLICT (driver_invoice_id) DO NOTHING
         """),
         {"run_id": billing_run_id, "invoice_ids": invoice_ids},
@@ -309,6 +340,47 @@ def mark_run_success(
         )
 
 
+def mark_runs_success(
+    db: Session,
+    payment_intents_by_run: dict[int, str],
+) -> None:
+    """
+    Batch form of mark_run_success used by reconciliation ({run_id: pi_id}).
+    Invoices are settled through billing_run_items, so no per-run id lookup.
+    """
+    if not payment_intents_by_run:
+        return
+    params = {
+        "run_ids": list(payment_intents_by_run.keys()),
+        "pi_ids": list(payment_intents_by_run.values()),
+    }
+    db.execute(
+        text("""
+            UPDATE public.billing_runs br
+            SET status = 'success',
+                stripe_payment_intent_id = v.pi_id,
+                updated_at = CURRENT_TIMESTAMP
+            FROM unnest(CAST(:run_ids AS int[]), CAST(:pi_ids AS text[])) AS v(run_id, pi_id)
+            WHERE br.id = v.run_id
+        """),
+        params,
+    )
+    db.execute(
+        text("""
+            UPDATE public.driver_invoices di
+            SET status = 'paid',
+                stripe_payment_intent_id = v.pi_id,
+                paid_at = CURRENT_TIMESTAMP,
+                is_exempt = FALSE
+            FROM unnest(CAST(:run_ids AS int[]), CAST(:pi_ids AS text[])) AS v(run_id, pi_id)
+            JOIN public.billing_run_items bri ON bri.billing_run_id = v.run_id
+            WHERE bri.driver_invoice_id = di.id
+              AND di.status = 'pending'
+        """),
+        params,
+    )
+
+
 def mark_run_failed(
     db: Session,
     billing_run_id: int,
@@ -5,22 +5,21 @@ from datetime import date, datetime, timedelta, timezone
 
 from fastapi import APIRouter, Depends, Form, Request
 from fastapi.responses import JSONResponse, RedirectResponse
-from fastapi.templating import Jinja2Templates
 from sqlalchemy import or_
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 from app.core.config import get_safe_base_url_from_request, is_beta_request, settings as core_settings
+from app.core.templates import templates
 from app.database import get_db
 from app.models.driver import Driver
 from app.services.email import send_century_referral_email, send_magic_link_email
-from app.services.magic_links import generate_magic_token, hash_magic_token, token_expiry
+from app.services.magic_links import generate_magic_token, hash_magic_token, legacy_hash_magic_token, token_expiry
 from app.services.packet_readiness import packet_readiness_for_driver
 from app.services.packet_storage import ensure_driver_space
 
 
 router = APIRouter(tags=["auth"])
-templates = Jinja2Templates(directory="app/templates")
 
 RESERVED_HANDLES = {
     "admin",
@@ -288,20 +287,19 @@ async def verify_magic_link(
     token: str,
     db: Session = Depends(get_db),
 ):
-    token_hash = hash_magic_token(token)
     token_row = db.execute(
         text(
             """
             SELECT id, email
             FROM magic_link_tokens
-            WHERE token_hash = :token_hash
+            WHERE token_hash IN (:token_hash, :legacy_token_hash)
               AND used_at IS NULL
               AND expires_at >= NOW()
             ORDER BY id DESC
             LIMIT 1
             """
         ),
-        {"token_hash": token_hash},
+        {"token_hash": hash_magic_token(token), "legacy_token_hash": legacy_hash_magic_token(token)},
     ).first()
 
     if not token_row:
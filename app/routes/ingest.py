@@ -346,7 +346,7 @@ async def ingest_load(
         # Including neg.id means a dismissed+reactivated negotiation gets a fresh
         # notification, while a simple re-post of the same load is suppressed.
         dedupe_key = f"notif:{driver.id}:{load.id}:{neg.id}:AUTO_SENT"
-        notif_inserted = record_notification(
+        notif = record_notification(
             db,
             driver_id=driver.id,
             notif_type="AUTO_SENT",
@@ -354,6 +354,7 @@ async def ingest_load(
             payload={"load_id": load.id, "neg_id": neg.id, "score": match["score"]},
             dedupe_key=dedupe_key,
         )
+        notif_inserted = notif.inserted
 
         if background_tasks is not None:
             # Broker email: blocked unless billing is active
@@ -381,7 +382,7 @@ async def ingest_load(
                 )
 
             # Driver alert email: only if guard approves AND notification is new
-            if notif_inserted and driver.email and should_email(db, driver, "AUTO_SENT"):
+            if notif_inserted and driver.email and should_email(driver, "AUTO_SENT", emails_last_hour=notif.emails_last_hour):
                 background_tasks.add_task(
                     send_driver_alert_email,
                     to_email=driver.email,
@@ -404,7 +405,7 @@ async def ingest_load(
         queued_negotiation_id = neg.id
 
         dedupe_key = f"notif:{driver.id}:{load.id}:{neg.id}:NEEDS_APPROVAL"
-        notif_inserted = record_notification(
+        notif = record_notification(
             db,
             driver_id=driver.id,
             notif_type="LOAD_MATCH",
@@ -412,8 +413,14 @@ async def ingest_load(
             payload={"load_id": load.id, "neg_id": neg.id, "score": match["score"]},
             dedupe_key=dedupe_key,
         )
-
-        if background_tasks is not None and notif_inserted and driver.email and should_email(db, driver, "NEEDS_APPROVAL"):
+        notif_inserted = notif.inserted
+
+        if (
+            background_tasks is not None
+            and notif_inserted
+            and driver.email
+            and should_email(driver, "NEEDS_APPROVAL", emails_last_hour=notif.emails_last_hour)
+        ):
             background_tasks.add_task(
                 send_driver_alert_email,
                 to_email=driver.email,
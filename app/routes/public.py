@@ -1,43 +1,61 @@
-from pathlib import Path
+import hashlib
+from functools import lru_cache
 
 from fastapi import APIRouter, Request
-from fastapi.templating import Jinja2Templates
+from fastapi.responses import Response
+
+from app.core.config import settings as core_settings
+from app.core.templates import templates
 
 
 router = APIRouter(tags=["public-pages"])
-templates = Jinja2Templates(
-	directory=str(Path(__file__).resolve().parents[1] / "templates")
-)
+
+_CACHE_PAGES = (core_settings.ENV or "").strip().lower() != "development"
+
+
+def _render_page(template_name: str) -> tuple[bytes, str]:
+	context = {"success": None, "error": None} if template_name == "public/contact.html" else {}
+	body = templates.get_template(template_name).render(**context).encode("utf-8")
+	return body, f'"{hashlib.md5(body).hexdigest()}"'
+
+
+# Public pages render static markup (no request/session state), so the
+# bytes are identical for every visitor; re-render per hit in development.
+_cached_page = lru_cache(maxsize=None)(_render_page)
+
+
+def _static_page(request: Request, template_name: str) -> Response:
+	body, etag = _cached_page(template_name) if _CACHE_PAGES else _render_page(template_name)
+	if request.headers.get("if-none-match") == etag:
+		return Response(status_code=304, headers={"ETag": etag})
+	return Response(content=body, media_type="text/html", headers={"ETag": etag})
 
 
 @router.get("/about")
 async def about_page(request: Request):
-	return templates.TemplateResponse("public/about.html", {"request": request})
+	return _static_page(request, "public/about.html")
 
 
 @router.get("/contact")
 async def contact_page(request: Request):
-	return templates.TemplateResponse(
-		"public/contact.html",
-		{"request": request, "success": None, "error": None},
-	)
+	return _static_page(request, "public/contact.html")
 
 
 @router.get("/faq")
 async def faq_page(request: Request):
-	return templates.TemplateResponse("public/faq.html", {"request": request})
+	return _static_page(request, "public/faq.html")
 
 
 @router.get("/pricing")
 async def pricing_page(request: Request):
-	return templates.TemplateResponse("public/pricing.html", {"request": request})
+	return _static_page(request, "public/pricing.html")
 
 
 @router.get("/services")
 async def services_page(request: Request):
-	return templates.TemplateResponse("public/services.html", {"request": request})
+	return _static_page(request, "public/services.html")
 
 
 @router.get("/setup-payment")
 async def setup_payment_page(request: Request):
-	return templates.TemplateResponse("public/setup-payment.html", {"request": request})
+	return _static_page(request, "public/setup-payment.html")
@@ -1,27 +1,39 @@
+#!/usr/bin/env python3
+from __future__ import annotations
+
 import argparse
-import psycopg2
+import sys
 from decimal import Decimal
+from pathlib import Path
+
+from dotenv import load_dotenv
+from sqlalchemy import text
+
+PROJECT_ROOT = Path(__file__).resolve().parents[2]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+load_dotenv(PROJECT_ROOT / ".env")
+
+from app.database import SessionLocal
+
 
 def get_referral_stats(driver_id):
-    # Connection logic for gcloads_db
-    conn = psycopg2.connect("host=localhost dbname=gcloads_db user=gcd_admin password=YOUR_PASSWORD port=5432")
-    cur = conn.cursor()
-
-    # 1. Get Referral Count
-    cur.execute("SELECT COUNT(*) FROM drivers WHERE referred_by_id = %s", (driver_id,))
-    total_referrals = cur.fetchone()[0]
-
-    # 2. Get Earnings Stats
-    cur.execute("""
-        SELECT 
-            SUM(amount) FILTER (WHERE status = 'AVAILABLE') as available,
-            SUM(amount) FILTER (WHERE status = 'PENDING') as pending,
-            COUNT(*) as total_loads
-        FROM referral_earnings 
-        WHERE referrer_id = %s
-    """, (driver_id,))
-    
-    available, pending, total_loads = cur.fetchone()
+    # Reuse the app's pooled engine (DATABASE_URL / DB_* from .env)
+    with SessionLocal() as db:
+        # Referral count + earnings stats in a single round-trip
+        total_referrals, available, pending, total_loads = db.execute(
+            text("""
+                SELECT 
+                    (SELECT COUNT(*) FROM drivers WHERE referred_by_id = :driver_id) as total_referrals,
+                    SUM(amount) FILTER (WHERE status = 'AVAILABLE') as available,
+                    SUM(amount) FILTER (WHERE status = 'PENDING') as pending,
+                    COUNT(*) as total_loads
+                FROM referral_earnings 
+                WHERE referrer_id = :driver_id
+            """),
+            {"driver_id": driver_id},
+        ).one()
 
     # Handle None values from SUM
     available = available or Decimal('0.00')
@@ -41,12 +53,9 @@ def get_referral_stats(driver_id):
         print(f"📈 Avg. Monthly Value/Ref:   ${avg_per_ref:,.2f}")
         print(f"\nPROJECTION: If you refer 10 drivers doing 4k/week,")
         print(f"you could be looking at ~$200.00/month in PASSIVE INCOME.")
-    
-    cur.close()
-    conn.close()
 
 if __name__ == "__main__":
     parser = argparse.ArgumentParser()
     parser.add_argument("--driver_id", type=int, required=True)
     args = parser.parse_args()
-    get_referral_stats(args.driver_id)
\ No newline at end of file
+    get_referral_stats(args.driver_id)
@@ -8,14 +8,19 @@ import time
 from datetime import datetime, timezone
 from pathlib import Path
 
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 load_dotenv(PROJECT_ROOT / ".env")
 
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
 from app.database import SessionLocal
 from app.models.broker import Broker
 from app.models.driver import Driver
@@ -23,85 +28,101 @@ from app.models.load import Load
 from app.models.operations import Message, Negotiation
 
 
-def _pick_driver(driver_email: str | None) -> Driver:
-    with SessionLocal() as db:
-        driver = None
-        if driver_email:
-            driver = db.query(Driver).filter(Driver.email == driver_email.strip().lower()).first()
-        if not driver:
-            driver = db.query(Driver).order_by(Driver.created_at.desc()).first()
-        if not driver:
-            raise RuntimeError("No driver found. Register a driver first.")
-        return driver
+_HTTP = requests.Session()
+_HTTP.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=9))
+_HTTP.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=9))
 
 
-def _pick_valid_broker_mc() -> str:
-    with SessionLocal() as db:
-        broker = db.query(Broker).order_by(Broker.mc_number.asc()).first()
-        if not broker or not broker.mc_number:
-            raise RuntimeError("No broker MC found in webwise.brokers; import broker data first.")
-        return broker.mc_number
+def _pick_driver(db: Session, driver_email: str | None) -> Driver:
+    driver = None
+    if driver_email:
+        driver = db.scalars(
+            select(Driver).where(Driver.email == driver_email.strip().lower()).limit(1)
+        ).first()
+    if driver is None:
+        driver = db.scalars(select(Driver).order_by(Driver.created_at.desc()).limit(1)).first()
+    if driver is None:
+        raise RuntimeError("No driver found. Register a driver first.")
+    return driver
 
 
-def _get_unread_count(base_url: str, driver_email: str) -> int:
-    response = requests.get(
-        f"{base_url}/api/notifications/unread-count",
+def _pick_valid_broker_mc(db: Session) -> str:
+    # Looked up once per run on the run's session; not cached across runs so
+    # broker data changes are picked up.
+    mc_number = db.scalar(select(Broker.mc_number).order_by(Broker.mc_number.asc()).limit(1))
+    if not mc_number:
+        raise RuntimeError("No broker MC found in webwise.brokers; import broker data first.")
+    return mc_number
+
+
+def _get_unread_count(unread_url: str, driver_email: str) -> int:
+    response = _HTTP.get(
+        unread_url,
         params={"email": driver_email},
         timeout=20,
     )
     response.raise_for_status()
-    payload = response.json()
+    payload = orjson.loads(response.content)
     return int(payload.get("unread_count", 0))
 
 
-def _find_negotiation(load_pk: int, driver_id: int) -> Negotiation | None:
-    with SessionLocal() as db:
-        return (
-            db.query(Negotiation)
-            .filter(Negotiation.load_id == load_pk, Negotiation.driver_id == driver_id)
-            .order_by(Negotiation.id.desc())
-            .first()
-        )
-
+def _wait_for_unread(
+    unread_url: str,
+    driver_email: str,
+    baseline: int,
+    deadline_s: float = 3.0,
+    interval_s: float = 0.05,
+    max_interval_s: float = 0.4,
+) -> int:
+    # Poll until the unread count moves past baseline, backing off between
+    # attempts; monotonic clock so wall-clock adjustments can't stretch the bound.
+    deadline = time.monotonic() + deadline_s
+    while True:
+        current = _get_unread_count(unread_url, driver_email)
+        remaining = deadline - time.monotonic()
+        if current > baseline or remaining <= 0:
+            return current
+        time.sleep(min(interval_s, remaining))
+        interval_s = min(interval_s * 2, max_interval_s)
+
+
+def _find_negotiation(db: Session, load_pk: int, driver_id: int) -> Negotiation | None:
+    return (
+        db.query(Negotiation)
+        .filter(Negotiation.load_id == load_pk, Negotiation.driver_id == driver_id)
+        .order_by(Negotiation.id.desc())
+        .first()
+    )
 
-def _ensure_negotiation(load_pk: int, driver: Driver, broker_mc_number: str) -> Negotiation:
-    negotiation = _find_negotiation(load_pk, driver.id)
-    if negotiation:
-        return negotiation
 
-    with SessionLocal() as db:
-        created = Negotiation(
-            load_id=load_pk,
-            driver_id=driver.id,
-            broker_mc_number=broker_mc_number,
-            status="Sent",
-        )
-        db.add(created)
-        db.commit()
-        db.refresh(created)
-        return created
+def _ensure_negotiation(db: Session, load_pk: int, driver: Driver, broker_mc_number: str) -> Negotiation:
+    created = Negotiation(
+        load_id=load_pk,
+        driver_id=driver.id,
+        broker_mc_number=broker_mc_number,
+        status="Sent",
+    )
+    db.add(created)
+    db.commit()
+    return created
 
 
-def _insert_mock_broker_reply(negotiation_id: int, load_ref: str) -> int:
-    with SessionLocal() as db:
-        inbound = Message(
-            negotiation_id=negotiation_id,
-            sender="Broker",
-            body=f"[VERIFY_LOOP {load_ref}] Is this still available? What is your rate?",
-            is_read=False,
-        )
-        db.add(inbound)
-        db.commit()
-        db.refresh(inbound)
-        return inbound.id
+def _insert_mock_broker_reply(db: Session, negotiation_id: int, load_ref: str) -> int:
+    inbound = Message(
+        negotiation_id=negotiation_id,
+        sender="Broker",
+        body=f"[VERIFY_LOOP {load_ref}] Is this still available? What is your rate?",
+        is_read=False,
+    )
+    db.add(inbound)
+    db.commit()
+    return inbound.id
 
 
-def _cleanup_test_data(load_ref: str) -> None:
-    with SessionLocal() as db:
-        load = db.query(Load).filter(Load.ref_id == load_ref).first()
-        if load:
-            db.delete(load)
-            db.commit()
+def _cleanup_test_data(db: Session, load_ref: str) -> None:
+    # negotiations/messages/load_documents/scout_ingest_log cascade at the DB level
+    db.execute(delete(Load).where(Load.ref_id == load_ref))
+    db.commit()
 
 
 def run_test(
@@ -112,87 +133,89 @@ def run_test(
     keep_data: bool,
 ) -> int:
     print("🚀 Starting Full-Loop Validation...")
+    ingest_url = f"{base_url}/api/scout/ingest"
+    unread_url = f"{base_url}/api/notifications/unread-count"
 
-    driver = _pick_driver(driver_email)
-    broker_mc = _pick_valid_broker_mc()
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
-    expected_identity = f"{driver.display_name}@{email_domain}"
-    print(f"✅ Identity verified for driver: {expected_identity}")
-
-    unread_before = _get_unread_count(base_url, driver.email)
-    print(f"🔎 Baseline unread count: {unread_before}")
-
-    load_ref = f"VERIFY-{int(datetime.now(timezone.utc).timestamp())}"
-    outbound_enabled = bool(test_recipient)
-
-    payload = {
-        "load_id": load_ref,
-        "source": "verify-loop",
-        "mc_number": broker_mc,
-        "email": test_recipient,
-        "origin": "Newark, NJ",
-        "destination": "Los Angeles, CA",
-        "price": "$3500",
-        "equipment_type": "Dry Van",
-        "contact_instructions": "call" if outbound_enabled else "email",
-        "driver_id": driver.id,
-        "auto_bid": outbound_enabled,
-    }
-
-    print("📡 Step 1: Simulating Scout ingest...")
-    response = requests.post(
-        f"{base_url}/api/scout/ingest",
-        json=payload,
-        headers={"x-api-key": api_key},
-        timeout=30,
-    )
-    try:
-        response_payload = response.json()
-    except Exception:
-        response_payload = {"raw": response.text}
-
-    if response.status_code >= 400:
-        raise RuntimeError(f"Ingest failed [{response.status_code}]: {response_payload}")
-
-    print(f"✅ Ingest response: {response_payload}")
-
-    identity_used = str(response_payload.get("identity_used") or "")
-    if expected_identity not in identity_used:
-        print(f"⚠️ Identity mismatch: expected to include {expected_identity}, got {identity_used}")
-    else:
-        print(f"✅ Outbound identity confirmed: {identity_used}")
-
-    load_pk = int(response_payload["load_id"])
-    negotiation = _find_negotiation(load_pk, driver.id)
-    if not negotiation:
-        negotiation = _ensure_negotiation(load_pk, driver, broker_mc)
-        print("ℹ️ Auto-bid did not create negotiation; created one for inbound-loop verification.")
-    else:
-        print(f"✅ Negotiation found: {negotiation.id}")
-
-    print("📥 Step 2: Simulating inbound broker reply...")
-    message_id = _insert_mock_broker_reply(negotiation.id, load_ref)
-    print(f"✅ Mock inbound inserted as message #{message_id} (is_read=False)")
-
-    print("🔴 Step 3: Asserting dashboard notification pulse...")
-    time.sleep(1)
-    unread_after = _get_unread_count(base_url, driver.email)
-    delta = unread_after - unread_before
-
-    if delta >= 1:
-        print(f"🔥 SUCCESS: unread moved from {unread_before} -> {unread_after} (delta={delta})")
-        success = True
-    else:
-        print(f"❌ FAILURE: unread stayed at {unread_after} (baseline={unread_before})")
-        success = False
-
-    if keep_data:
-        print(f"🧪 Keeping test data for inspection (load ref: {load_ref}).")
-    else:
-        _cleanup_test_data(load_ref)
-        print(f"🧹 Cleanup complete for load ref: {load_ref}")
-
-    return 0 if success else 1
+    with SessionLocal() as db:
+        driver = _pick_driver(db, driver_email)
+        broker_mc = _pick_valid_broker_mc(db)
+        email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+        expected_identity = f"{driver.display_name}@{email_domain}"
+        print(f"✅ Identity verified for driver: {expected_identity}")
+
+        unread_before = _get_unread_count(unread_url, driver.email)
+        print(f"🔎 Baseline unread count: {unread_before}")
+
+        load_ref = f"VERIFY-{int(datetime.now(timezone.utc).timestamp())}"
+        outbound_enabled = bool(test_recipient)
+
+        payload = {
+            "load_id": load_ref,
+            "source": "verify-loop",
+            "mc_number": broker_mc,
+            "email": test_recipient,
+            "origin": "Newark, NJ",
+            "destination": "Los Angeles, CA",
+            "price": "$3500",
+            "equipment_type": "Dry Van",
+            "contact_instructions": "call" if outbound_enabled else "email",
+            "driver_id": driver.id,
+            "auto_bid": outbound_enabled,
+        }
+
+        print("📡 Step 1: Simulating Scout ingest...")
+        response = _HTTP.post(
+            ingest_url,
+            json=payload,
+            headers={"x-api-key": api_key},
+            timeout=30,
+        )
+        try:
+            response_payload = orjson.loads(response.content)
+        except orjson.JSONDecodeError:
+            response_payload = {"raw": response.text}
+
+        if response.status_code >= 400:
+            raise RuntimeError(f"Ingest failed [{response.status_code}]: {response_payload}")
+
+        print(f"✅ Ingest response: {response_payload}")
+
+        identity_used = str(response_payload.get("identity_used") or "")
+        if expected_identity not in identity_used:
+            print(f"⚠️ Identity mismatch: expected to include {expected_identity}, got {identity_used}")
+        else:
+            print(f"✅ Outbound identity confirmed: {identity_used}")
+
+        load_pk = int(response_payload["load_id"])
+        negotiation = _find_negotiation(db, load_pk, driver.id)
+        if not negotiation:
+            negotiation = _ensure_negotiation(db, load_pk, driver, broker_mc)
+            print("ℹ️ Auto-bid did not create negotiation; created one for inbound-loop verification.")
+        else:
+            print(f"✅ Negotiation found: {negotiation.id}")
+
+        print("📥 Step 2: Simulating inbound broker reply...")
+        message_id = _insert_mock_broker_reply(db, negotiation.id, load_ref)
+        print(f"✅ Mock inbound inserted as message #{message_id} (is_read=False)")
+
+        print("🔴 Step 3: Asserting dashboard notification pulse...")
+        unread_after = _wait_for_unread(unread_url, driver.email, unread_before)
+        delta = unread_after - unread_before
+
+        if delta >= 1:
+            print(f"🔥 SUCCESS: unread moved from {unread_before} -> {unread_after} (delta={delta})")
+            success = True
+        else:
+            print(f"❌ FAILURE: unread stayed at {unread_after} (baseline={unread_before})")
+            success = False
+
+        if keep_data:
+            print(f"🧪 Keeping test data for inspection (load ref: {load_ref}).")
+        else:
+            _cleanup_test_data(db, load_ref)
+            print(f"🧹 Cleanup complete for load ref: {load_ref}")
+
+        return 0 if success else 1
 
 
 def main() -> int:
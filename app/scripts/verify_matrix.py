@@ -4,12 +4,14 @@ from __future__ import annotations
 import argparse
 import os
 import sys
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from decimal import Decimal
 from pathlib import Path
 
+import orjson
 import requests
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
 
 PROJECT_ROOT = Path(__file__).resolve().parents[2]
 if str(PROJECT_ROOT) not in sys.path:
@@ -17,20 +19,31 @@ if str(PROJECT_ROOT) not in sys.path:
 
 load_dotenv(PROJECT_ROOT / ".env")
 
+from sqlalchemy import text, update
+
 from app.database import SessionLocal
 from app.models.driver import Driver
 from app.models.operations import Negotiation
 
 
-@dataclass(frozen=True)
+_HTTP = requests.Session()
+_HTTP.mount("http://", HTTPAdapter(pool_connections=4, pool_maxsize=9))
+_HTTP.mount("https://", HTTPAdapter(pool_connections=4, pool_maxsize=9))
+
+
+@dataclass(frozen=True, slots=True)
 class MatrixCase:
     zone: str
     label: str
     offer: int
     expected_action: str
+    message_text: str = field(init=False)
+
+    def __post_init__(self) -> None:
+        object.__setattr__(self, "message_text", f"We can do ${self.offer:,} all-in.")
 
 
-MATRIX_CASES: list[MatrixCase] = [
+MATRIX_CASES: tuple[MatrixCase, ...] = (
     MatrixCase("RED", "Low", 1000, "WALK_AWAY"),
     MatrixCase("RED", "Med", 1400, "WALK_AWAY"),
     MatrixCase("RED", "High", 1590, "WALK_AWAY"),
@@ -40,7 +53,7 @@ MATRIX_CASES: list[MatrixCase] = [
     MatrixCase("GREEN", "Low", 1910, "SEND_COUNTER"),
     MatrixCase("GREEN", "Med", 2100, "SEND_COUNTER"),
     MatrixCase("GREEN", "High", 2400, "SEND_COUNTER"),
-]
+)
 
 
 def _pick_negotiation_id(explicit_id: int | None) -> int:
@@ -54,26 +67,38 @@ def _pick_negotiation_id(explicit_id: int | None) -> int:
         return int(latest.id)
 
 
-def _load_driver_for_negotiation(negotiation_id: int) -> tuple[int, Decimal | None, Decimal | None]:
+def _apply_matrix_floor(negotiation_id: int, min_flat_rate: float, min_cpm: float) -> tuple[int, Decimal | None, Decimal | None]:
+    # Snapshot the current floor and force the matrix floor in one statement;
+    # the self-joined "previous" row sees pre-update values.
     with SessionLocal() as db:
-        negotiation = db.query(Negotiation).filter(Negotiation.id == negotiation_id).first()
-        if not negotiation:
+        row = db.execute(
+            text(
+                """
+                UPDATE public.drivers AS d
+                SET min_flat_rate = :min_flat_rate, min_cpm = :min_cpm
+                FROM public.negotiations AS n, public.drivers AS previous
+                WHERE n.id = :negotiation_id
+                  AND d.id = n.driver_id
+                  AND previous.id = d.id
+                RETURNING d.id, previous.min_flat_rate, previous.min_cpm
+                """
+            ),
+            {"negotiation_id": negotiation_id, "min_flat_rate": min_flat_rate, "min_cpm": min_cpm},
+        ).one_or_none()
+        if row is None:
             raise RuntimeError(f"Negotiation not found: {negotiation_id}")
+        db.commit()
 
-        driver = db.query(Driver).filter(Driver.id == negotiation.driver_id).first()
-        if not driver:
-            raise RuntimeError(f"Driver not found for negotiation: {negotiation_id}")
-
-        return int(driver.id), driver.min_flat_rate, driver.min_cpm
+        return int(row.id), row.min_flat_rate, row.min_cpm
 
 
-def _set_driver_floor(driver_id: int, min_flat_rate: float, min_cpm: float) -> None:
+def _restore_driver_floor(driver_id: int, min_flat_rate: float, min_cpm: float) -> None:
     with SessionLocal() as db:
-        driver = db.query(Driver).filter(Driver.id == driver_id).first()
-        if not driver:
-            raise RuntimeError(f"Driver not found: {driver_id}")
-        driver.min_flat_rate = min_flat_rate
-        driver.min_cpm = min_cpm
+        db.execute(
+            update(Driver)
+            .where(Driver.id == driver_id)
+            .values(min_flat_rate=min_flat_rate, min_cpm=min_cpm)
+        )
         db.commit()
 
 
@@ -86,58 +111,72 @@ def _effective_action(payload: dict) -> str:
     return action_taken
 
 
-def _run_case(base_url: str, case: MatrixCase, negotiation_id: int, admin_password: str | None) -> tuple[bool, str, str]:
+def _evaluate_case(case: MatrixCase, payload: dict) -> tuple[bool, str, str]:
+    effective = _effective_action(payload)
+    passed = effective == case.expected_action
+    details = (
+        f"effective={effective} action_taken={payload.get('action_taken')} "
+        f"pending={payload.get('pending_review_action')}"
+    )
+    return (passed, effective or "UNKNOWN", details)
+
+
+def _run_cases(
+    simulate_url: str,
+    cases: tuple[MatrixCase, ...],
+    negotiation_id: int,
+    admin_password: str | None,
+) -> list[tuple[bool, str, str]]:
     form_data = {
         "negotiation_id": str(negotiation_id),
-        "message_text": f"We can do ${case.offer:,} all-in.",
+        "message_text": [case.message_text for case in cases],
         "dry_run": "true",
     }
     if admin_password:
         form_data["admin_password"] = admin_password
 
-    response = requests.post(
-        f"{base_url}/api/test/simulate-broker",
+    response = _HTTP.post(
+        simulate_url,
         data=form_data,
-        timeout=30,
+        timeout=30 * len(cases),
     )
 
     try:
-        payload = response.json()
-    except Exception:
+        payload = orjson.loads(response.content)
+    except orjson.JSONDecodeError:
         payload = {"raw": response.text}
 
-    if response.status_code >= 400 or payload.get("status") != "ok":
-        return (
-            False,
-            "ERROR",
-            f"HTTP {response.status_code} payload={payload}",
-        )
+    results = payload.get("results") or []
+    if response.status_code >= 400 or payload.get("status") != "ok" or len(results) != len(cases):
+        error = (False, "ERROR", f"HTTP {response.status_code} payload={payload}")
+        return [error] * len(cases)
 
-    effective = _effective_action(payload)
-    passed = effective == case.expected_action
-    details = (
-        f"effective={effective} action_taken={payload.get('action_taken')} "
-        f"pending={payload.get('pending_review_action')}"
-    )
-    return (passed, effective or "UNKNOWN", details)
+    return [_evaluate_case(case, result) for case, result in zip(cases, results)]
 
 
-def _print_header(negotiation_id: int, floor_value: int, base_url: str) -> None:
-    print(f"Regression Matrix | negotiation_id={negotiation_id} | forced_floor=${floor_value:,}")
-    print(f"Endpoint: {base_url}/api/test/simulate-broker (dry_run=true)")
-    print("-" * 108)
-    print(f"{'Zone':<8} {'Case':<6} {'Offer':>10} {'Expected':<14} {'Actual':<14} {'Result':<8} Details")
-    print("-" * 108)
+def _header_lines(negotiation_id: int, floor_value: int, simulate_url: str) -> list[str]:
+    return [
+        f"Regression Matrix | negotiation_id={negotiation_id} | forced_floor=${floor_value:,}",
+        f"Endpoint: {simulate_url} (dry_run=true)",
+        "-" * 108,
+        f"{'Zone':<8} {'Case':<6} {'Offer':>10} {'Expected':<14} {'Actual':<14} {'Result':<8} Details",
+        "-" * 108,
+    ]
 
 
-def _print_row(case: MatrixCase, actual: str, ok: bool, details: str) -> None:
+def _row_line(case: MatrixCase, actual: str, ok: bool, details: str) -> str:
     result = "PASS" if ok else "FAIL"
-    print(
+    return (
         f"{case.zone:<8} {case.label:<6} ${case.offer:>9,} {case.expected_action:<14} "
         f"{actual:<14} {result:<8} {details}"
     )
 
 
+def _write_lines(lines: list[str]) -> None:
+    sys.stdout.write("\n".join(lines) + "\n")
+    sys.stdout.flush()
+
+
 def main() -> int:
     parser = argparse.ArgumentParser(description="Run 9-point negotiation regression matrix.")
     parser.add_argument("--negotiation-id", type=int, default=None, help="Target negotiation ID (default: latest)")
@@ -151,36 +190,37 @@ def main() -> int:
     args = parser.parse_args()
 
     negotiation_id = _pick_negotiation_id(args.negotiation_id)
-    driver_id, original_flat, original_cpm = _load_driver_for_negotiation(negotiation_id)
+    driver_id, original_flat, original_cpm = _apply_matrix_floor(negotiation_id, float(args.floor), 0.0)
 
+    simulate_url = f"{args.base_url.rstrip('/')}/api/test/simulate-broker-batch"
     failures = 0
+    lines = _header_lines(negotiation_id, args.floor, simulate_url)
 
     try:
-        _set_driver_floor(driver_id, float(args.floor), 0.0)
-        _print_header(negotiation_id, args.floor, args.base_url.rstrip("/"))
-
-        for case in MATRIX_CASES:
-            ok, actual, details = _run_case(
-                base_url=args.base_url.rstrip("/"),
-                case=case,
-                negotiation_id=negotiation_id,
-                admin_password=(args.admin_password or None),
-            )
-            _print_row(case, actual, ok, details)
+        results = _run_cases(
+            simulate_url=simulate_url,
+            cases=MATRIX_CASES,
+            negotiation_id=negotiation_id,
+            admin_password=(args.admin_password or None),
+        )
+
+        for case, (ok, actual, details) in zip(MATRIX_CASES, results):
+            lines.append(_row_line(case, actual, ok, details))
             if not ok:
                 failures += 1
 
-        print("-" * 108)
+        lines.append("-" * 108)
         if failures:
-            print(f"Matrix FAILED: {failures}/{len(MATRIX_CASES)} failing case(s).")
+            lines.append(f"Matrix FAILED: {failures}/{len(MATRIX_CASES)} failing case(s).")
             return 1
 
-        print(f"Matrix PASSED: {len(MATRIX_CASES)}/{len(MATRIX_CASES)} cases green.")
+        lines.append(f"Matrix PASSED: {len(MATRIX_CASES)}/{len(MATRIX_CASES)} cases green.")
         return 0
     finally:
+        _write_lines(lines)
         restore_flat = float(original_flat) if original_flat is not None else 0.0
         restore_cpm = float(original_cpm) if original_cpm is not None else 0.0
-        _set_driver_floor(driver_id, restore_flat, restore_cpm)
+        _restore_driver_floor(driver_id, restore_flat, restore_cpm)
 
 
 if __name__ == "__main__":
@@ -2,11 +2,12 @@
 from __future__ import annotations
 
 import argparse
+import copy
 import os
 import sys
-from dataclasses import dataclass
 from email.message import EmailMessage
 from pathlib import Path
+from typing import NamedTuple
 
 from dotenv import load_dotenv
 
@@ -16,6 +17,8 @@ if str(PROJECT_ROOT) not in sys.path:
 
 load_dotenv(PROJECT_ROOT / ".env")
 
+from sqlalchemy import Row, select
+
 from app.database import SessionLocal
 from app.logic.parser import extract_negotiation_id_from_message
 from app.models.driver import Driver
@@ -23,41 +26,42 @@ from app.models.load import Load
 from app.models.operations import Negotiation
 
 
-@dataclass
-class RoutingResult:
+class RoutingResult(NamedTuple):
     ok: bool
     case_name: str
     details: str
 
 
-def _get_negotiation_context(negotiation_id: int) -> tuple[Negotiation, Driver, Load]:
+def _get_negotiation_context(negotiation_id: int) -> Row:
     with SessionLocal() as db:
-        negotiation = db.query(Negotiation).filter(Negotiation.id == negotiation_id).first()
-        if not negotiation:
+        context = db.execute(
+            select(Driver.display_name, Load.id.label("load_id"), Load.ref_id)
+            .select_from(Negotiation)
+            .join(Driver, Driver.id == Negotiation.driver_id)
+            .join(Load, Load.id == Negotiation.load_id)
+            .where(Negotiation.id == negotiation_id)
+        ).one_or_none()
+        if context is None:
             raise RuntimeError(f"Negotiation not found: {negotiation_id}")
 
-        driver = db.query(Driver).filter(Driver.id == negotiation.driver_id).first()
-        if not driver:
-            raise RuntimeError(f"Driver not found for negotiation: {negotiation_id}")
+        return context
 
-        load = db.query(Load).filter(Load.id == negotiation.load_id).first()
-        if not load:
-            raise RuntimeError(f"Load not found for negotiation: {negotiation_id}")
 
-        return negotiation, driver, load
+def _base_message(*, to_address: str, from_address: str) -> EmailMessage:
+    msg = EmailMessage()
+    msg["To"] = to_address
+    msg["From"] = from_address
+    return msg
 
 
 def _build_message(
+    base: EmailMessage,
     *,
-    to_address: str,
-    from_address: str,
     subject: str,
     body: str,
     header_negotiation_id: int | None = None,
 ) -> EmailMessage:
-    msg = EmailMessage()
-    msg["To"] = to_address
-    msg["From"] = from_address
+    msg = copy.deepcopy(base)
     msg["Subject"] = subject
     if header_negotiation_id is not None:
         msg["X-GCD-Negotiation-ID"] = str(header_negotiation_id)
@@ -89,26 +93,26 @@ def _run_case(
 
 
 def run_verification(negotiation_id: int, email_domain: str) -> int:
-    negotiation, driver, load = _get_negotiation_context(negotiation_id)
+    context = _get_negotiation_context(negotiation_id)
 
-    safe_handle = (driver.display_name or "dispatch").strip().lower().replace(" ", "")
-    load_ref = load.ref_id or str(load.id)
+    safe_handle = (context.display_name or "dispatch").strip().lower().replace(" ", "")
+    load_ref = context.ref_id or str(context.load_id)
 
-    no_tag_to = f"{safe_handle}@{email_domain}"
-    broker_from = "broker@example.com"
+    base_msg = _base_message(
+        to_address=f"{safe_handle}@{email_domain}",
+        from_address="broker@example.com",
+    )
 
     case_a_msg = _build_message(
-        to_address=no_tag_to,
-        from_address=broker_from,
+        base_msg,
         subject=f"Re: Load {load_ref}",
         body="Routing verification: header-only fallback",
-        header_negotiation_id=negotiation.id,
+        header_negotiation_id=negotiation_id,
     )
 
     case_b_msg = _build_message(
-        to_address=no_tag_to,
-        from_address=broker_from,
-        subject=f"Re: Load {load_ref} [GCD:{negotiation.id}]",
+        base_msg,
+        subject=f"Re: Load {load_ref} [GCD:{negotiation_id}]",
         body="Routing verification: subject-only fallback",
         header_negotiation_id=None,
     )
@@ -118,17 +122,17 @@ def run_verification(negotiation_id: int, email_domain: str) -> int:
             case_name="Case A - Header Fallback",
             msg=case_a_msg,
             email_domain=email_domain,
-            expected_negotiation_id=negotiation.id,
+            expected_negotiation_id=negotiation_id,
         ),
         _run_case(
             case_name="Case B - Subject Fallback",
             msg=case_b_msg,
             email_domain=email_domain,
-            expected_negotiation_id=negotiation.id,
+            expected_negotiation_id=negotiation_id,
         ),
     ]
 
-    print(f"Negotiation: {negotiation.id} | Driver: {driver.display_name} | Load Ref: {load_ref}")
+    print(f"Negotiation: {negotiation_id} | Driver: {context.display_name} | Load Ref: {load_ref}")
     print("-" * 72)
 
     failures = 0
@@ -2,25 +2,25 @@
 Weekly billing orchestration service.
 
 Flow per driver:
-  1. Load pending invoices
+  1. Load pending invoices (with Stripe info + existing run, one query)
   2. Check for existing billing_run (idempotency)
   3. Create billing_run row
   4. Attach invoices to run
-  5. Call Stripe off-session
+  5. Call Stripe off-session (thread pool across drivers)
   6. Commit results
   7. On Stripe success after DB failure: mark needs_reconcile
 """
 import logging
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from dataclasses import dataclass, field
-from datetime import date, datetime, timezone
+from datetime import date, datetime, timedelta, timezone
 from decimal import Decimal
-from typing import Any
 
 import pytz
 from sqlalchemy.orm import Session
 
 from app.repositories import billing_repo
-from app.repositories.billing_repo import is_driver_billing_exempt
+from app.repositories.billing_repo import PendingDriverBilling, is_driver_billing_exempt
 from app.services.stripe_billing import (
     PaymentIntentResult,
     create_payment_intent_off_session,
@@ -31,23 +31,36 @@ logger = logging.getLogger(__name__)
 
 BILLING_TIMEZONE = pytz.timezone("America/New_York")
 
+# Concurrent off-session PaymentIntent calls per billing run
+STRIPE_MAX_WORKERS = 16
+
 
 # ---------------------------------------------------------------------------
 # Data shapes
 # ---------------------------------------------------------------------------
 
-@dataclass
+@dataclass(slots=True)
 class DriverRunResult:
     driver_id: int
     week_ending: date
     invoice_ids: list[int]
     total_amount_cents: int
-    status: str           # success | failed | skipped | dry_run | needs_reconcile | exempt_success
+    status: str           # success | failed | skipped | dry_run | needs_reconcile | charge_error | exempt_success
     error_message: str | None = None
     stripe_payment_intent_id: str | None = None
 
 
-@dataclass
+@dataclass(slots=True)
+class PendingCharge:
+    driver_id: int
+    run_id: int
+    invoice_ids: list[int]
+    total_cents: int
+    customer_id: str
+    payment_method_id: str
+
+
+@dataclass(slots=True)
 class BillingJobResult:
     week_ending: date
     dry_run: bool
@@ -69,8 +82,7 @@ def current_week_ending() -> date:
     """Returns the most recent Friday in America/New_York."""
     now = datetime.now(BILLING_TIMEZONE)
     days_since_friday = (now.weekday() - 4) % 7
-    friday = now.date() if days_since_friday == 0 else (now - __import__("datetime").timedelta(days=days_since_friday)).date()
-    return friday
+    return now.date() - timedelta(days=days_since_friday)
 
 
 # ---------------------------------------------------------------------------
@@ -99,15 +111,42 @@ def run_weekly_billing(
     if not dry_run:
         _reconcile_pending_runs(db)
 
-    grouped = billing_repo.get_pending_invoices_grouped_by_driver(db, week_ending)
+    pending = billing_repo.get_pending_billing_context(db, week_ending)
 
-    if not grouped:
+    if not pending:
         logger.info("billing_job: no pending invoices found for week_ending=%s", week_ending)
         return result
 
-    for driver_id, invoices in grouped.items():
+    # DB prep runs serially on the caller's session; only the Stripe calls
+    # fan out to worker threads. Results are written back on this thread.
+    driver_results: list[DriverRunResult | None] = [None] * len(pending)
+    charges: list[tuple[int, PendingCharge]] = []
+    for index, context in enumerate(pending):
+        prepared = _prepare_driver(db, context, week_ending, dry_run)
+        if isinstance(prepared, PendingCharge):
+            charges.append((index, prepared))
+        else:
+            driver_results[index] = prepared
+
+    if charges:
+        with ThreadPoolExecutor(max_workers=min(STRIPE_MAX_WORKERS, len(charges))) as executor:
+            futures = {
+                executor.submit(_charge_driver, charge, week_ending): (index, charge)
+                for index, charge in charges
+            }
+            for future in as_completed(futures):
+                index, charge = futures[future]
+                try:
+                    stripe_result = future.result()
+                except Exception as e:
+                    # Don't let one worker abort the loop: other drivers may
+                    # already be charged and still need finalizing.
+                    driver_results[index] = _charge_error_result(charge, e, week_ending)
+                    continue
+                driver_results[index] = _finalize_charge(db, charge, stripe_result, week_ending)
+
+    for driver_result in driver_results:
         result.drivers_processed += 1
-        driver_result = _process_driver(db, driver_id, invoices, week_ending, dry_run)
         result.driver_results.append(driver_result)
 
         if driver_result.status == "success":
@@ -116,7 +155,7 @@ def run_weekly_billing(
         elif driver_result.status == "exempt_success":
             result.drivers_exempted += 1
             result.exempt_total_amount_cents += driver_result.total_amount_cents
-        elif driver_result.status in ("failed", "needs_reconcile"):
+        elif driver_result.status in ("failed", "needs_reconcile", "charge_error"):
             result.drivers_failed += 1
         elif driver_result.status == "skipped":
             result.drivers_skipped += 1
@@ -140,15 +179,19 @@ def run_weekly_billing(
 # Per-driver processing
 # ---------------------------------------------------------------------------
 
-def _process_driver(
+def _prepare_driver(
     db: Session,
-    driver_id: int,
-    invoices: list[dict[str, Any]],
+    context: PendingDriverBilling,
     week_ending: date,
     dry_run: bool,
-) -> DriverRunResult:
-    invoice_ids = [inv["id"] for inv in invoices]
-    total_cents = sum(inv["fee_amount_cents"] for inv in invoices)
+) -> DriverRunResult | PendingCharge:
+    """
+    DB-side work for one driver. Returns a final DriverRunResult when no
+    Stripe call is needed, otherwise the PendingCharge to submit.
+    """
+    driver_id = context.driver_id
+    invoice_ids = context.invoice_ids
+    total_cents = context.total_cents
 
     # Dry run — no DB writes, no Stripe calls
     if dry_run:
@@ -165,7 +208,7 @@ def _process_driver(
         )
 
     # Idempotency check — skip if already succeeded or exempt this week
-    existing_run = billing_repo.get_billing_run(db, driver_id, week_ending)
+    existing_run = context.existing_run
     if existing_run and existing_run["status"] in ("success", "exempt_success"):
         logger.info(
             "billing_job: skipping driver=%d already %s run_id=%d",
@@ -179,28 +222,17 @@ def _process_driver(
             status="skipped",
         )
 
-    driver_info = billing_repo.get_driver_stripe_info(db, driver_id)
+    driver_info = context.driver_info
 
     # Beta / exempt drivers: create run, mark exempt_success, do NOT call Stripe
     if is_driver_billing_exempt(driver_info, week_ending):
         try:
-            run_id = billing_repo.create_billing_run(db, driver_id, week_ending, total_cents)
-            billing_repo.attach_invoices_to_run(db, run_id, invoice_ids, week_ending)
-            billing_repo.mark_run_exempt_success(db, run_id, invoice_ids)
-            db.commit()
-            logger.info(
-                "billing_job: exempt_success driver=%d run_id=%d total_cents=%d",
-                driver_id, run_id, total_cents,
-            )
-            return DriverRunResult(
-                driver_id=driver_id,
-                week_ending=week_ending,
-                invoice_ids=invoice_ids,
-                total_amount_cents=total_cents,
-                status="exempt_success",
-            )
+            with db.begin_nested():
+                run_id = billing_repo.create_billing_run(db, driver_id, week_ending, total_cents)
+                billing_repo.attach_invoices_to_run(db, run_id, invoice_ids, week_ending)
+                billing_repo.mark_run_exempt_success(db, run_id, invoice_ids)
         except Exception as e:
-            db.rollback()
+            # Savepoint already unwound — only this driver's writes are lost
             logger.error("billing_job: driver=%d exempt run failed: %s", driver_id, str(e))
             return DriverRunResult(
                 driver_id=driver_id,
@@ -210,6 +242,18 @@ def _process_driver(
                 status="failed",
                 error_message=f"exempt_db_error:{str(e)}",
             )
+        db.commit()
+        logger.info(
+            "billing_job: exempt_success driver=%d run_id=%d total_cents=%d",
+            driver_id, run_id, total_cents,
+        )
+        return DriverRunResult(
+            driver_id=driver_id,
+            week_ending=week_ending,
+            invoice_ids=invoice_ids,
+            total_amount_cents=total_cents,
+            status="exempt_success",
+        )
 
     # Check driver has Stripe payment method (paid drivers only)
     if not driver_info or not driver_info.get("stripe_customer_id") or not driver_info.get("stripe_default_payment_method_id"):
@@ -225,9 +269,9 @@ def _process_driver(
 
     # Create billing_run row (idempotent via ON CONFLICT DO NOTHING)
     try:
-        run_id = billing_repo.create_billing_run(db, driver_id, week_ending, total_cents)
-        billing_repo.attach_invoices_to_run(db, run_id, invoice_ids, week_ending)
-        db.commit()
+        with db.begin_nested():
+            run_id = billing_repo.create_billing_run(db, driver_id, week_ending, total_cents)
+            billing_repo.attach_invoices_to_run(db, run_id, invoice_ids, week_ending)
     except ValueError as e:
         # Already succeeded — shouldn't reach here but be safe
         logger.info("billing_job: driver=%d %s", driver_id, str(e))
@@ -239,7 +283,6 @@ def _process_driver(
             status="skipped",
         )
     except Exception as e:
-        db.rollback()
         logger.error("billing_job: driver=%d DB error creating run: %s", driver_id, str(e))
         return DriverRunResult(
             driver_id=driver_id,
@@ -249,18 +292,70 @@ def _process_driver(
             status="failed",
             error_message=f"db_error:{str(e)}",
         )
+    db.commit()
 
-    # Stripe idempotency key — deterministic per (driver_id, week_ending)
-    idempotency_key = f"billing-{driver_id}-{week_ending.isoformat()}"
-
-    stripe_result: PaymentIntentResult = create_payment_intent_off_session(
+    return PendingCharge(
+        driver_id=driver_id,
+        run_id=run_id,
+        invoice_ids=invoice_ids,
+        total_cents=total_cents,
         customer_id=driver_info["stripe_customer_id"],
         payment_method_id=driver_info["stripe_default_payment_method_id"],
-        amount_cents=total_cents,
+    )
+
+
+def _charge_driver(charge: PendingCharge, week_ending: date) -> PaymentIntentResult:
+    """Stripe call only — safe to run on a worker thread (no Session use)."""
+    # Stripe idempotency key — deterministic per (driver_id, week_ending)
+    idempotency_key = f"billing-{charge.driver_id}-{week_ending.isoformat()}"
+
+    return create_payment_intent_off_session(
+        customer_id=charge.customer_id,
+        payment_method_id=charge.payment_method_id,
+        amount_cents=charge.total_cents,
         idempotency_key=idempotency_key,
         description=f"CoDriver Freight weekly fee — week ending {week_ending}",
     )
 
+
+def _charge_error_result(
+    charge: PendingCharge,
+    error: Exception,
+    week_ending: date,
+) -> DriverRunResult:
+    """
+    The Stripe call raised instead of returning a result, so whether the
+    driver was charged is unknown. Nothing is written: marking the run
+    failed would set a possibly-charged driver delinquent. The run stays
+    pending with no PaymentIntent id, which _reconcile_pending_runs never
+    picks up, so it is reported as charge_error for manual follow-up (its
+    idempotency key is billing-<driver>-<week>).
+    """
+    logger.error(
+        "billing_job: charge error driver=%d run_id=%d error=%s",
+        charge.driver_id, charge.run_id, str(error),
+    )
+    return DriverRunResult(
+        driver_id=charge.driver_id,
+        week_ending=week_ending,
+        invoice_ids=charge.invoice_ids,
+        total_amount_cents=charge.total_cents,
+        status="charge_error",
+        error_message=f"charge_error:{str(error)}",
+    )
+
+
+def _finalize_charge(
+    db: Session,
+    charge: PendingCharge,
+    stripe_result: PaymentIntentResult,
+    week_ending: date,
+) -> DriverRunResult:
+    driver_id = charge.driver_id
+    run_id = charge.run_id
+    invoice_ids = charge.invoice_ids
+    total_cents = charge.total_cents
+
     if stripe_result.success:
         try:
             billing_repo.mark_run_success(db, run_id, stripe_result.payment_intent_id, invoice_ids)
@@ -301,12 +396,12 @@ def _process_driver(
     else:
         # Stripe failed — mark run + invoices failed, set driver delinquent
         try:
-            billing_repo.mark_run_failed(db, run_id, stripe_result.error_message or "unknown", invoice_ids)
-            billing_repo.set_driver_delinquent(db, driver_id)
-            db.commit()
+            with db.begin_nested():
+                billing_repo.mark_run_failed(db, run_id, stripe_result.error_message or "unknown", invoice_ids)
+                billing_repo.set_driver_delinquent(db, driver_id)
         except Exception as db_err:
-            db.rollback()
             logger.error("billing_job: driver=%d failed to write failure state: %s", driver_id, str(db_err))
+        db.commit()
 
         logger.warning(
             "billing_job: failed driver=%d run_id=%d error=%s",
@@ -331,36 +426,56 @@ def _reconcile_pending_runs(db: Session) -> None:
     For any billing_run with status=needs_reconcile, retrieve the Stripe PI
     and if it succeeded, mark the run and invoices as paid.
     """
-    runs = billing_repo.get_needs_reconcile_runs(db)
+    runs = [
+        run for run in billing_repo.get_needs_reconcile_runs(db)
+        if run.get("stripe_payment_intent_id")
+    ]
     if not runs:
         return
 
     logger.info("billing_job: reconciling %d needs_reconcile runs", len(runs))
 
-    for run in runs:
-        pi_id = run.get("stripe_payment_intent_id")
-        if not pi_id:
-            continue
+    # PIs are independent — retrieve them concurrently, then settle in one batch
+    with ThreadPoolExecutor(max_workers=min(STRIPE_MAX_WORKERS, len(runs))) as executor:
+        stripe_results = list(executor.map(
+            retrieve_payment_intent,
+            [run["stripe_payment_intent_id"] for run in runs],
+        ))
 
-        stripe_result = retrieve_payment_intent(pi_id)
+    reconciled: dict[int, str] = {}
+    for run, stripe_result in zip(runs, stripe_results):
+        pi_id = run["stripe_payment_intent_id"]
         if not stripe_result.success:
             logger.warning(
                 "billing_job: reconcile run_id=%d pi=%s still not succeeded status=%s",
                 run["id"], pi_id, stripe_result.stripe_status,
             )
             continue
+        reconciled[run["id"]] = pi_id
 
-        # Fetch invoice ids for this run
-        from sqlalchemy import text as _text
-        invoice_rows = db.execute(
-            _text("SELECT driver_invoice_id FROM public.billing_run_items WHERE billing_run_id = :rid"),
-            {"rid": run["id"]},
-        ).scalars().all()
+    if not reconciled:
+        return
 
+    try:
+        billing_repo.mark_runs_success(db, reconciled)
+        db.commit()
+        logger.info("billing_job: reconciled run_ids=%s", sorted(reconciled))
+        return
+    except Exception as e:
+        db.rollback()
+        logger.warning(
+            "billing_job: batch reconcile failed run_ids=%s, settling runs one by one: %s",
+            sorted(reconciled), str(e),
+        )
+
+    # One bad row must not keep the rest unsettled: retry each run in its
+    # own savepoint so only the failing run stays needs_reconcile.
+    for run_id, pi_id in reconciled.items():
         try:
-            billing_repo.mark_run_success(db, run["id"], pi_id, list(invoice_rows))
-            db.commit()
-            logger.info("billing_job: reconciled run_id=%d pi=%s", run["id"], pi_id)
+            with db.begin_nested():
+                billing_repo.mark_runs_success(db, {run_id: pi_id})
         except Exception as e:
-            db.rollback()
-            logger.error("billing_job: reconcile commit failed run_id=%d: %s", run["id"], str(e))
+            logger.error("billing_job: reconcile commit failed run_id=%d: %s", run_id, str(e))
+            continue
+        logger.info("billing_job: reconciled run_id=%d pi=%s", run_id, pi_id)
+    db.commit()
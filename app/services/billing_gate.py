@@ -36,12 +36,28 @@ TRIAL_DAYS = 7
 
 # ── Internal helpers ──────────────────────────────────────────────────────────
 
-def _billing_status(driver: "Driver") -> str:
-    return (getattr(driver, "billing_status", None) or "trial").strip().lower()
+def _driver_gate_state(driver: "Driver") -> tuple[str, bool]:
+    """Normalized (billing_status, is_beta) — read and lowercased once per call."""
+    status = (getattr(driver, "billing_status", None) or "trial").strip().lower()
+    is_beta = (getattr(driver, "billing_mode", None) or "").strip().lower() == "beta"
+    return status, is_beta
 
 
-def _is_beta(driver: "Driver") -> bool:
-    return (getattr(driver, "billing_mode", None) or "").strip().lower() == "beta"
+def _as_utc(value: datetime) -> datetime:
+    # The column is TIMESTAMPTZ (migration 028), so loaded rows are aware;
+    # Driver objects built in code or tests can still carry naive values,
+    # which are treated as UTC.
+    return value.replace(tzinfo=timezone.utc) if value.tzinfo is None else value
+
+
+def _days_until(trial_ends_at: datetime | None) -> int | None:
+    if trial_ends_at is None:
+        return None
+    seconds_left = (_as_utc(trial_ends_at) - datetime.now(timezone.utc)).total_seconds()
+    if seconds_left <= 0:
+        return 0
+    # Ceiling: any partial day counts as a full day (minimum 1)
+    return max(1, math.ceil(seconds_left / 86400))
 
 
 def maybe_flip_trial_expired(driver: "Driver", db) -> bool:
@@ -51,21 +67,15 @@ def maybe_flip_trial_expired(driver: "Driver", db) -> bool:
     Returns True if the status was changed (so the caller can commit).
     Beta drivers are always skipped — they never expire.
     """
-    if _is_beta(driver):
-        return False
-    if _billing_status(driver) != "trial":
+    status, is_beta = _driver_gate_state(driver)
+    if is_beta or status != "trial":
         return False
 
     trial_ends_at = getattr(driver, "trial_ends_at", None)
     if trial_ends_at is None:
         return False
 
-    now = datetime.now(timezone.utc)
-    # Make trial_ends_at tz-aware if stored naive
-    if trial_ends_at.tzinfo is None:
-        trial_ends_at = trial_ends_at.replace(tzinfo=timezone.utc)
-
-    if now > trial_ends_at:
+    if datetime.now(timezone.utc) > _as_utc(trial_ends_at):
         driver.billing_status = "card_required"
         db.add(driver)
         logger.info("billing_gate: trial expired for driver=%s → card_required", driver.id)
@@ -78,12 +88,14 @@ def maybe_flip_trial_expired(driver: "Driver", db) -> bool:
 
 def is_active(driver: "Driver") -> bool:
     """True for active billing OR beta drivers (beta is always active)."""
-    return _is_beta(driver) or _billing_status(driver) == "active"
+    status, is_beta = _driver_gate_state(driver)
+    return is_beta or status == "active"
 
 
 def is_trial(driver: "Driver") -> bool:
     """True only for public trial drivers — beta drivers are never in trial."""
-    return not _is_beta(driver) and _billing_status(driver) == "trial"
+    status, is_beta = _driver_gate_state(driver)
+    return not is_beta and status == "trial"
 
 
 def trial_days_remaining(driver: "Driver") -> int | None:
@@ -94,17 +106,7 @@ def trial_days_remaining(driver: "Driver") -> int | None:
     """
     if not is_trial(driver):
         return None
-    trial_ends_at = getattr(driver, "trial_ends_at", None)
-    if trial_ends_at is None:
-        return None
-    now = datetime.now(timezone.utc)
-    if trial_ends_at.tzinfo is None:
-        trial_ends_at = trial_ends_at.replace(tzinfo=timezone.utc)
-    seconds_left = (trial_ends_at - now).total_seconds()
-    if seconds_left <= 0:
-        return 0
-    # Ceiling: any partial day counts as a full day (minimum 1)
-    return max(1, math.ceil(seconds_left / 86400))
+    return _days_until(getattr(driver, "trial_ends_at", None))
 
 
 def require_active(driver: "Driver", action: str = "this action") -> None:
@@ -113,14 +115,16 @@ def require_active(driver: "Driver", action: str = "this action") -> None:
     Use at the top of any route or service that does real work.
     Beta drivers (billing_mode='beta') always pass — they are never gated.
     """
-    if _is_beta(driver):
+    # Fast path: canonical values as written by activation / beta admin
+    if getattr(driver, "billing_status", None) == "active" or getattr(driver, "billing_mode", None) == "beta":
         return
-    status = _billing_status(driver)
-    if status == "active":
+
+    status, is_beta = _driver_gate_state(driver)
+    if is_beta or status == "active":
         return
 
     if status == "trial":
-        days = trial_days_remaining(driver)
+        days = _days_until(getattr(driver, "trial_ends_at", None))
         if days is not None and days > 0:
             days_str = f"Your trial ends in {days} day{'s' if days != 1 else ''}. "
         else:
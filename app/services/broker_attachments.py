@@ -1,3 +1,4 @@
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 from sqlalchemy.orm import Session
@@ -15,7 +16,10 @@ _DOC_FILENAME = {
     "AUTHORITY": "mc_authority.pdf",
 }
 
-_ALLOWED_TYPES = tuple(_DOC_FILENAME.keys())
+_ALLOWED_TYPES = frozenset(_DOC_FILENAME)
+
+# Per-load documents; everything else is a driver-level document
+_NEGOTIATION_SCOPED_TYPES = frozenset({"BOL_PACKET", "RATECON", "BOL_RAW", "BOL_PDF"})
 
 
 def _read_doc_payload(doc: dict) -> bytes | None:
@@ -37,28 +41,39 @@ def _read_doc_payload(doc: dict) -> bytes | None:
 
 def _normalize_selection(selections: list[str] | None) -> list[str]:
     normalized: list[str] = []
+    seen: set[str] = set()
     for raw in selections or []:
         doc_type = str(raw or "").strip().upper()
-        if doc_type in _ALLOWED_TYPES and doc_type not in normalized:
+        if doc_type in _ALLOWED_TYPES and doc_type not in seen:
+            seen.add(doc_type)
             normalized.append(doc_type)
     return normalized
 
 
-def _map_doc_for_selection(
+def _active_docs_by_type(
     db: Session,
     *,
     driver_id: int,
     negotiation_id: int,
-    doc_type: str,
-) -> dict | None:
-    scoped_negotiation_id = negotiation_id if doc_type in {"BOL_PACKET", "RATECON"} else None
-    docs = get_active_documents(
-        db,
-        driver_id=driver_id,
-        negotiation_id=scoped_negotiation_id,
-        doc_types=[doc_type],
-    )
-    return docs[0] if docs else None
+    doc_types: list[str],
+) -> dict[str, dict]:
+    """Latest active doc per type — one query per scope (negotiation / driver)."""
+    scoped_types = [doc_type for doc_type in doc_types if doc_type in _NEGOTIATION_SCOPED_TYPES]
+    driver_types = [doc_type for doc_type in doc_types if doc_type not in _NEGOTIATION_SCOPED_TYPES]
+
+    docs_by_type: dict[str, dict] = {}
+    for scope_negotiation_id, scope_types in ((negotiation_id, scoped_types), (None, driver_types)):
+        if not scope_types:
+            continue
+        # Rows come back newest first, so the first hit per type wins
+        for doc in get_active_documents(
+            db,
+            driver_id=driver_id,
+            negotiation_id=scope_negotiation_id,
+            doc_types=scope_types,
+        ):
+            docs_by_type.setdefault(doc["doc_type"], doc)
+    return docs_by_type
 
 
 def build_broker_email_attachments(
@@ -72,47 +87,52 @@ def build_broker_email_attachments(
     if not selected_types:
         selected_types = ["BOL_PACKET"]
 
-    if "BOL_PACKET" in selected_types:
-        bol_packet_doc = _map_doc_for_selection(
-            db,
-            driver_id=driver_id,
-            negotiation_id=negotiation_id,
-            doc_type="BOL_PACKET",
-        )
-        if not bol_packet_doc:
-            bol_raw_exists = bool(
-                get_active_documents(
-                    db,
-                    driver_id=driver_id,
-                    negotiation_id=negotiation_id,
-                    doc_types=["BOL_RAW", "BOL_PDF"],
-                )
+    wants_bol_packet = "BOL_PACKET" in selected_types
+    docs_by_type = _active_docs_by_type(
+        db,
+        driver_id=driver_id,
+        negotiation_id=negotiation_id,
+        doc_types=(selected_types + ["BOL_RAW", "BOL_PDF"]) if wants_bol_packet else selected_types,
+    )
+
+    if wants_bol_packet and "BOL_PACKET" not in docs_by_type:
+        if "BOL_RAW" in docs_by_type or "BOL_PDF" in docs_by_type:
+            composed = compose_bol_packet(
+                db,
+                driver_id=driver_id,
+                negotiation_id=negotiation_id,
             )
-            if bol_raw_exists:
-                composed = compose_bol_packet(
+            if not composed.get("ok"):
+                return {"ok": False, **composed}
+            docs_by_type.update(
+                _active_docs_by_type(
                     db,
                     driver_id=driver_id,
                     negotiation_id=negotiation_id,
+                    doc_types=["BOL_PACKET"],
                 )
-                if not composed.get("ok"):
-                    return {"ok": False, **composed}
-            else:
-                return {"ok": False, "message": "upload_bol_first"}
-
-    attachments: list[tuple[str, bytes, str]] = []
-    included_doc_types: list[str] = []
+            )
+        else:
+            return {"ok": False, "message": "upload_bol_first"}
 
+    docs: list[dict] = []
     for doc_type in selected_types:
-        doc = _map_doc_for_selection(
-            db,
-            driver_id=driver_id,
-            negotiation_id=negotiation_id,
-            doc_type=doc_type,
-        )
+        doc = docs_by_type.get(doc_type)
         if not doc:
             return {"ok": False, "message": f"{doc_type.lower()}_missing"}
+        docs.append(doc)
+
+    # Storage reads are independent round trips — fetch them concurrently.
+    if len(docs) > 1:
+        with ThreadPoolExecutor(max_workers=len(docs)) as executor:
+            payloads = list(executor.map(_read_doc_payload, docs))
+    else:
+        payloads = [_read_doc_payload(doc) for doc in docs]
+
+    attachments: list[tuple[str, bytes, str]] = []
+    included_doc_types: list[str] = []
 
-        payload = _read_doc_payload(doc)
+    for doc_type, payload in zip(selected_types, payloads):
         if not payload:
             return {"ok": False, "message": f"{doc_type.lower()}_not_readable"}
 
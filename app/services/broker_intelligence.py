@@ -1,18 +1,75 @@
 import logging
 import re
+import string
+from functools import lru_cache
 from typing import Any
 
-from sqlalchemy import case
+from sqlalchemy import Integer, bindparam, case, literal, select, true
 from sqlalchemy.orm import Session
 
 from app.models.broker import Broker, BrokerEmail
 from app.models.operations import BrokerOverride
 
 _MC_STRIP_RE = re.compile(r"[^0-9]")
-_MC_DIGITS_RE = re.compile(r"^\d{4,8}$")
+_MC_SEP_RE = re.compile(r"[^A-Za-z0-9]")
+# Deletes ASCII letters, punctuation and whitespace, leaving the digits
+_MC_ASCII_NON_DIGITS = str.maketrans("", "", string.ascii_letters + string.punctuation + string.whitespace)
 _MC_FF_RE = re.compile(r"^FF\d+$")  # always matched against uppercased input
 
-
+# Triage lookups as one Core statement (built once, so SQLAlchemy's compiled
+# cache is reused): driver-scoped override beats global, then the preferred
+# broker record (non-empty company_name first) and the best email.
+_override = (
+    select(BrokerOverride.id, BrokerOverride.notes, BrokerOverride.is_blocked)
+    .where(BrokerOverride.broker_mc_number.in_(bindparam("candidates", expanding=True)))
+    .order_by(
+        (BrokerOverride.driver_id == bindparam("driver_id", type_=Integer)).desc().nulls_last(),
+        BrokerOverride.updated_at.desc(),
+    )
+    .limit(1)
+    .cte("override")
+)
+_broker = (
+    select(Broker.mc_number, Broker.primary_phone, Broker.secondary_phone, Broker.internal_note)
+    .where(Broker.mc_number.in_(bindparam("candidates", expanding=True)))
+    .order_by(
+        case(
+            (Broker.company_name.is_(None), 1),
+            (Broker.company_name == "", 1),
+            else_=0,
+        ),
+        Broker.updated_at.desc(),
+        Broker.mc_number,
+    )
+    .limit(1)
+    .cte("broker")
+)
+_broker_email = (
+    select(BrokerEmail.email)
+    .where(BrokerEmail.mc_number.in_(bindparam("candidates", expanding=True)))
+    .order_by(BrokerEmail.confidence.desc(), BrokerEmail.created_at.desc(), BrokerEmail.id.desc())
+    .limit(1)
+    .cte("broker_email")
+)
+_anchor = select(literal(1).label("one")).subquery("anchor")
+
+_TRIAGE_STMT = select(
+    _override.c.id.label("override_id"),
+    _override.c.notes.label("override_notes"),
+    _override.c.is_blocked.label("override_is_blocked"),
+    _broker.c.mc_number.label("broker_mc_number"),
+    _broker.c.primary_phone,
+    _broker.c.secondary_phone,
+    _broker.c.internal_note,
+    _broker_email.c.email.label("broker_email"),
+).select_from(
+    _anchor.outerjoin(_override, true())
+    .outerjoin(_broker, true())
+    .outerjoin(_broker_email, true())
+)
+
+
+@lru_cache(maxsize=8192)
 def normalize_mc(raw: str | None) -> str | None:
     """Normalize an MC number string to its canonical form.
 
@@ -30,12 +87,16 @@ def normalize_mc(raw: str | None) -> str | None:
     stripped = raw.strip()
 
     # Freight forwarder MC — normalize separators before testing (handles "FF-003723", "ff 003723")
-    ff_candidate = re.sub(r"[^A-Za-z0-9]", "", stripped).upper()
-    if _MC_FF_RE.match(ff_candidate):
-        return ff_candidate
+    if "F" in stripped or "f" in stripped:
+        ff_candidate = _MC_SEP_RE.sub("", stripped).upper()
+        if _MC_FF_RE.match(ff_candidate):
+            return ff_candidate
 
-    digits = _MC_STRIP_RE.sub("", stripped)
-    return digits if _MC_DIGITS_RE.match(digits) else None
+    # ASCII fast path; anything left that isn't a plain digit goes through the regex
+    digits = stripped.translate(_MC_ASCII_NON_DIGITS)
+    if not (digits.isascii() and digits.isdigit()):
+        digits = _MC_STRIP_RE.sub("", stripped)
+    return digits if 4 <= len(digits) <= 8 else None
 
 
 def _mc_candidates(mc: str) -> list[str]:
@@ -47,20 +108,31 @@ def _mc_candidates(mc: str) -> list[str]:
     against a padded DB record.
 
     FF-prefix freight forwarder MCs are returned as a single-element list —
-    they have no zero-padding ambiguity.
+    they have no zero-padding ambiguity. Neither do MCs of 7+ digits.
 
-    Duplicates are removed while preserving order (as-is first).
+    Candidates are distinct and ordered as-is first.
     """
-    if mc.startswith("FF"):
+    n = len(mc)
+    if n >= 7 or mc.startswith("FF"):
         return [mc]
-
-    seen: set[str] = set()
-    candidates: list[str] = []
-    for candidate in [mc, mc.zfill(6), mc.zfill(7)]:
-        if candidate not in seen:
-            seen.add(candidate)
-            candidates.append(candidate)
-    return candidates
+    if n == 6:
+        return [mc, mc.zfill(7)]
+    return [mc, mc.zfill(6), mc.zfill(7)]
+
+
+def _standing(
+    is_blocked: bool | None,
+    override_notes: str | None,
+    broker_note: str | None,
+) -> dict[str, str | None]:
+    """Broker standing by precedence: override block, override note, broker note."""
+    if is_blocked:
+        return {"status": "BLACKLISTED", "note": override_notes or "DO NOT BOOK"}
+    if override_notes:
+        return {"status": "NOTE", "note": override_notes}
+    if broker_note:
+        return {"status": "NOTE", "note": broker_note}
+    return {"status": "NEUTRAL", "note": None}
 
 
 def triage_broker_contact(
@@ -70,8 +142,6 @@ def triage_broker_contact(
     driver_id: int | None,
     contact_instructions: str | None = "email",
 ) -> dict[str, Any]:
-    standing: dict[str, str | None] = {"status": "NEUTRAL", "note": None}
-
     mc_number = normalize_mc(mc_number)
 
     if not mc_number:
@@ -86,56 +156,14 @@ def triage_broker_contact(
 
     candidates = _mc_candidates(mc_number)
 
-    override = None
-    if driver_id is not None:
-        override = (
-            db.query(BrokerOverride)
-            .filter(
-                BrokerOverride.driver_id == driver_id,
-                BrokerOverride.broker_mc_number.in_(candidates),
-            )
-            .order_by(BrokerOverride.updated_at.desc())
-            .first()
-        )
-    if override is None:
-        override = (
-            db.query(BrokerOverride)
-            .filter(BrokerOverride.broker_mc_number.in_(candidates))
-            .order_by(BrokerOverride.updated_at.desc())
-            .first()
-        )
-
-    # Prefer: non-empty company_name first, then most recently updated, then stable by mc_number
-    broker_record = (
-        db.query(Broker)
-        .filter(Broker.mc_number.in_(candidates))
-        .order_by(
-            case(
-                (Broker.company_name.is_(None), 1),
-                (Broker.company_name == "", 1),
-                else_=0,
-            ),
-            Broker.updated_at.desc(),
-            Broker.mc_number,
-        )
-        .first()
-    )
-    phone = None
-    if broker_record:
-        phone = broker_record.primary_phone or broker_record.secondary_phone
-        if broker_record.internal_note:
-            standing = {"status": "NOTE", "note": broker_record.internal_note}
-
-    if override:
-        override_note = override.notes or "DO NOT BOOK"
-        if override.is_blocked:
-            standing = {"status": "BLACKLISTED", "note": override_note}
-        elif getattr(override, "is_preferred", False):
-            standing = {"status": "PREFERRED", "note": "Top Tier Broker"}
-        elif override.notes:
-            standing = {"status": "NOTE", "note": override.notes}
-
-    if standing["status"] == "BLACKLISTED":
+    row = db.execute(_TRIAGE_STMT, {"candidates": candidates, "driver_id": driver_id}).mappings().one()
+
+    # Missing override / broker rows come back as NULL columns from the LEFT JOINs
+    broker_found = row["broker_mc_number"] is not None
+    phone = row["primary_phone"] or row["secondary_phone"]
+    standing = _standing(row["override_is_blocked"], row["override_notes"], row["internal_note"])
+
+    if row["override_is_blocked"]:
         logging.info("Load %s blocked by broker standing BLACKLISTED for MC %s.", load_id, mc_number)
         return {
             "action": "BROKER_BLOCKED",
@@ -155,23 +183,18 @@ def triage_broker_contact(
             "reason": "contact_instruction_call",
         }
 
-    broker_email_record = (
-        db.query(BrokerEmail)
-        .filter(BrokerEmail.mc_number.in_(candidates))
-        .order_by(BrokerEmail.confidence.desc(), BrokerEmail.created_at.desc(), BrokerEmail.id.desc())
-        .first()
-    )
-    if broker_email_record:
-        logging.info("Direct email hit for MC %s: %s", mc_number, broker_email_record.email)
+    broker_email = row["broker_email"]
+    if broker_email:
+        logging.info("Direct email hit for MC %s: %s", mc_number, broker_email)
         return {
             "action": "EMAIL_BROKER",
-            "email": broker_email_record.email,
+            "email": broker_email,
             "phone": phone,
             "standing": standing,
             "reason": "broker_email_found",
         }
 
-    if broker_record:
+    if broker_found:
         logging.info("MC %s found in broker directory without email; call workflow.", mc_number)
         return {
             "action": "CALL_REQUIRED",
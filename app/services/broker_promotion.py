@@ -24,9 +24,32 @@ logger = logging.getLogger(__name__)
 _EMAIL_RE = re.compile(r"^[a-zA-Z0-9._%+\-]+@[a-zA-Z0-9.\-]+\.[a-zA-Z]{2,}$")
 _DIGITS_RE = re.compile(r"\D")
 
+_SELECT_BROKER = text("""
+    SELECT mc_number, primary_email, primary_phone, dot_number,
+           preferred_contact_method
+    FROM webwise.brokers
+    WHERE mc_number = ANY(:candidates)
+    ORDER BY company_name NULLS LAST
+    LIMIT 1
+""")
+
+_INSERT_EMAIL = text("""
+    INSERT INTO webwise.broker_emails
+        (mc_number, email, source, confidence)
+    VALUES
+        (:mc, :email, 'scout', 0.80)
+    ON CONFLICT (mc_number, email) DO NOTHING
+    RETURNING id
+""")
+
 
 def _normalize_email(value: str | None) -> str | None:
-    cleaned = (value or "").strip().lower()
+    if not value:
+        return None
+    cleaned = value.strip()
+    # Scout usually sends lowercase already — skip the extra copy
+    if not cleaned.islower():
+        cleaned = cleaned.lower()
     return cleaned if _EMAIL_RE.match(cleaned) else None
 
 
@@ -58,14 +81,7 @@ def promote_scout_contact(
 
     candidates = _mc_candidates(mc_number)
     broker_row = db.execute(
-        text("""
-            SELECT mc_number, primary_email, primary_phone, dot_number,
-                   preferred_contact_method
-            FROM webwise.brokers
-            WHERE mc_number = ANY(:candidates)
-            ORDER BY company_name NULLS LAST
-            LIMIT 1
-        """),
+        _SELECT_BROKER,
         {"candidates": candidates},
     ).mappings().first()
 
@@ -86,14 +102,7 @@ def promote_scout_contact(
     # --- Email into broker_emails table (always attempt, idempotent) ---
     if email:
         result = db.execute(
-            text("""
-                INSERT INTO webwise.broker_emails
-                    (mc_number, email, source, confidence)
-                VALUES
-                    (:mc, :email, 'scout', 0.80)
-                ON CONFLICT (mc_number, email) DO NOTHING
-                RETURNING id
-            """),
+            _INSERT_EMAIL,
             {"mc": mc_number, "email": email},
         ).first()
         if result:
@@ -1,28 +1,30 @@
 from sqlalchemy.orm import Session
-from app.models.operations import Negotiation, Message
-from app.models.broker import Broker
+from app.models.operations import Negotiation
 from app.models.load import Load
+from app.services.broker_intelligence import triage_broker_contact
 
 def process_scraped_load(db: Session, load_id: int):
     # 1. Fetch the load
     load = db.query(Load).filter(Load.id == load_id).first()
     
     # 2. Find the Broker email
-    # Extract MC from 'ref_id' (e.g., 'TS-123456') or 'raw_data'
-    mc_number = load.ref_id.split('-')[-1] 
-    broker = db.query(Broker).filter(Broker.mc_number == mc_number).first()
+    # Prefer the load's MC; fall back to the 'ref_id' suffix (e.g., 'TS-123456').
+    # triage_broker_contact handles normalization and zero-padding variants.
+    mc_number = load.mc_number or load.ref_id.rsplit('-', 1)[-1]
+    driver_id = load.ingested_by_driver_id # the scout who found it
+    triage = triage_broker_contact(db, mc_number, load.id, driver_id, "email")
     
-    if broker and broker.primary_email:
+    if triage["action"] == "EMAIL_BROKER":
         # 3. Create a Negotiation entry
         neg = Negotiation(
             load_id=load.id,
-            driver_id=load.driver_id, # Link to the scout who found it
+            driver_id=driver_id,
             status="DRAFT",
             current_offer=load.price
         )
         db.add(neg)
         db.flush() # Get the neg.id
         
-        return {"status": "matched", "email": broker.primary_email}
+        return {"status": "matched", "email": triage["email"]}
     
-    return {"status": "no_contact_found"}
\ No newline at end of file
+    return {"status": "no_contact_found"}
@@ -1,10 +1,16 @@
-import json
 from typing import Any
 
+import orjson
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 
+def _negotiation_match(negotiation_id: int | None) -> str:
+    # Separate NULL / equality forms keep the predicate indexable; COALESCE()
+    # or "IS NOT DISTINCT FROM" would force a filter over every active row.
+    return "negotiation_id IS NULL" if negotiation_id is None else "negotiation_id = :negotiation_id"
+
+
 def upsert_driver_document(
     db: Session,
     *,
@@ -16,76 +22,60 @@ def upsert_driver_document(
     bucket: str | None = None,
     source_version: str | None = None,
 ) -> int | None:
-    existing = db.execute(
-        text(
-            """
-            SELECT id
-            FROM driver_documents
-            WHERE driver_id = :driver_id
-              AND doc_type = :doc_type
-              AND COALESCE(negotiation_id, 0) = COALESCE(:negotiation_id, 0)
-              AND is_active = TRUE
-              AND file_key = :file_key
-              AND COALESCE(sha256_hash, '') = :sha256_hash
-                            AND COALESCE(source_version, '') = COALESCE(:source_version, '')
-            ORDER BY id DESC
-            LIMIT 1
-            """
-        ),
-        {
-            "driver_id": driver_id,
-            "doc_type": doc_type,
-            "negotiation_id": negotiation_id,
-            "file_key": file_key,
-            "sha256_hash": sha256_hash,
-            "source_version": source_version,
-        },
-    ).first()
-    if existing:
-        return int(existing.id)
-
-    db.execute(
-        text(
-            """
-            UPDATE driver_documents
-            SET is_active = FALSE
-            WHERE driver_id = :driver_id
-              AND doc_type = :doc_type
-              AND COALESCE(negotiation_id, 0) = COALESCE(:negotiation_id, 0)
-              AND is_active = TRUE
-            """
-        ),
-        {
-            "driver_id": driver_id,
-            "doc_type": doc_type,
-            "negotiation_id": negotiation_id,
-        },
-    )
-
-    inserted = db.execute(
+    # One round trip: reuse an identical active row, otherwise retire the
+    # current active row(s) for this slot and insert the new one. All CTEs
+    # share one snapshot, so the UPDATE never sees the freshly inserted row.
+    row = db.execute(
         text(
-            """
-            INSERT INTO driver_documents (
-                driver_id,
-                negotiation_id,
-                doc_type,
-                bucket,
-                file_key,
-                sha256_hash,
-                source_version,
-                is_active
+            f"""
+            WITH existing AS (
+                SELECT id
+                FROM driver_documents
+                WHERE driver_id = :driver_id
+                  AND doc_type = :doc_type
+                  AND {_negotiation_match(negotiation_id)}
+                  AND is_active = TRUE
+                  AND file_key = :file_key
+                  AND COALESCE(sha256_hash, '') = :sha256_hash
+                  AND COALESCE(source_version, '') = COALESCE(CAST(:source_version AS text), '')
+                ORDER BY id DESC
+                LIMIT 1
+            ),
+            deactivated AS (
+                UPDATE driver_documents
+                SET is_active = FALSE
+                WHERE driver_id = :driver_id
+                  AND doc_type = :doc_type
+                  AND {_negotiation_match(negotiation_id)}
+                  AND is_active = TRUE
+                  AND NOT EXISTS (SELECT 1 FROM existing)
+            ),
+            inserted AS (
+                INSERT INTO driver_documents (
+                    driver_id,
+                    negotiation_id,
+                    doc_type,
+                    bucket,
+                    file_key,
+                    sha256_hash,
+                    source_version,
+                    is_active
+                )
+                SELECT
+                    CAST(:driver_id AS integer),
+                    CAST(:negotiation_id AS integer),
+                    :doc_type,
+                    :bucket,
+                    :file_key,
+                    :sha256_hash,
+                    :source_version,
+                    TRUE
+                WHERE NOT EXISTS (SELECT 1 FROM existing)
+                RETURNING id
             )
-            VALUES (
-                :driver_id,
-                :negotiation_id,
-                :doc_type,
-                :bucket,
-                :file_key,
-                :sha256_hash,
-                :source_version,
-                TRUE
-            )
-            RETURNING id
+            SELECT id FROM existing
+            UNION ALL
+            SELECT id FROM inserted
             """
         ),
         {
@@ -98,7 +88,7 @@ def upsert_driver_document(
             "source_version": source_version,
         },
     ).first()
-    return int(inserted.id) if inserted else None
+    return int(row.id) if row else None
 
 
 def deactivate_active_documents(
@@ -110,12 +100,12 @@ def deactivate_active_documents(
 ) -> int:
     updated = db.execute(
         text(
-            """
+            f"""
             UPDATE driver_documents
             SET is_active = FALSE
             WHERE driver_id = :driver_id
               AND doc_type = :doc_type
-              AND COALESCE(negotiation_id, 0) = COALESCE(:negotiation_id, 0)
+              AND {_negotiation_match(negotiation_id)}
               AND is_active = TRUE
             """
         ),
@@ -128,6 +118,16 @@ def deactivate_active_documents(
     return int(updated.rowcount or 0)
 
 
+def _document_dicts(rows) -> list[dict[str, Any]]:
+    # Column types already match the dict contract (empty strings are folded
+    # to NULL in SQL); only uploaded_at needs formatting.
+    docs = [dict(row) for row in rows]
+    for doc in docs:
+        if doc["uploaded_at"] is not None:
+            doc["uploaded_at"] = doc["uploaded_at"].isoformat()
+    return docs
+
+
 def get_active_documents(
     db: Session,
     *,
@@ -137,17 +137,14 @@ def get_active_documents(
 ) -> list[dict[str, Any]]:
     rows = db.execute(
         text(
-            """
-            SELECT id, driver_id, negotiation_id, doc_type, bucket, file_key, uploaded_at
-                                 , sha256_hash, source_version
+            f"""
+            SELECT id, driver_id, negotiation_id, doc_type, NULLIF(bucket, '') AS bucket, file_key, uploaded_at
+                                 , NULLIF(sha256_hash, '') AS sha256_hash, NULLIF(source_version, '') AS source_version
             FROM driver_documents
             WHERE driver_id = :driver_id
               AND is_active = TRUE
               AND doc_type = ANY(:doc_types)
-              AND (
-                    (:negotiation_id IS NULL AND negotiation_id IS NULL)
-                    OR negotiation_id = :negotiation_id
-                  )
+              AND {_negotiation_match(negotiation_id)}
             ORDER BY id DESC
             """
         ),
@@ -157,28 +154,50 @@ def get_active_documents(
             "negotiation_id": negotiation_id,
         },
     ).mappings().all()
+    return _document_dicts(rows)
+
 
-    return [
+def get_active_documents_multi(
+    db: Session,
+    *,
+    driver_id: int,
+    negotiation_id: int,
+    doc_types: list[str],
+) -> list[dict[str, Any]]:
+    # Driver-level (negotiation_id NULL) and negotiation-scoped documents in
+    # one round trip, newest first; callers split them by negotiation_id.
+    rows = db.execute(
+        text(
+            """
+            SELECT id, driver_id, negotiation_id, doc_type, NULLIF(bucket, '') AS bucket, file_key, uploaded_at
+                                 , NULLIF(sha256_hash, '') AS sha256_hash, NULLIF(source_version, '') AS source_version
+            FROM driver_documents
+            WHERE driver_id = :driver_id
+              AND is_active = TRUE
+              AND doc_type = ANY(:doc_types)
+              AND (negotiation_id IS NULL OR negotiation_id = :negotiation_id)
+            ORDER BY id DESC
+            """
+        ),
         {
-            "id": int(row["id"]),
-            "driver_id": int(row["driver_id"]),
-            "negotiation_id": int(row["negotiation_id"]) if row["negotiation_id"] is not None else None,
-            "doc_type": str(row["doc_type"]),
-            "bucket": str(row["bucket"]) if row["bucket"] else None,
-            "file_key": str(row["file_key"]),
-            "uploaded_at": row["uploaded_at"].isoformat() if row["uploaded_at"] else None,
-            "sha256_hash": str(row["sha256_hash"]) if row["sha256_hash"] else None,
-            "source_version": str(row["source_version"]) if row["source_version"] else None,
-        }
-        for row in rows
-    ]
+            "driver_id": driver_id,
+            "doc_types": doc_types,
+            "negotiation_id": negotiation_id,
+        },
+    ).mappings().all()
+    return _document_dicts(rows)
 
 
 def snapshot_metadata_from_docs(docs: list[dict[str, Any]]) -> str:
-    metadata = {
-        "doc_ids": [doc["id"] for doc in docs],
-        "doc_types": [doc["doc_type"] for doc in docs],
-        "file_keys": [doc["file_key"] for doc in docs],
-        "buckets": [doc.get("bucket") for doc in docs],
-    }
-    return json.dumps(metadata)
+    doc_ids: list[int] = []
+    doc_types: list[str] = []
+    file_keys: list[str] = []
+    buckets: list[str | None] = []
+    for doc in docs:
+        doc_ids.append(doc["id"])
+        doc_types.append(doc["doc_type"])
+        file_keys.append(doc["file_key"])
+        buckets.append(doc.get("bucket"))
+    return orjson.dumps(
+        {"doc_ids": doc_ids, "doc_types": doc_types, "file_keys": file_keys, "buckets": buckets}
+    ).decode()
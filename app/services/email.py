@@ -1,15 +1,20 @@
 import asyncio
 import io
+import mmap
 import os
 import re
 import smtplib
+from concurrent.futures import ThreadPoolExecutor
 from email.message import EmailMessage
+from functools import lru_cache, partial
 from pathlib import Path
+from typing import NamedTuple
 
-from PyPDF2 import PdfReader, PdfWriter
+import pikepdf
 from reportlab.pdfgen import canvas
 
 from app.core.config import settings
+from app.services.smtp_pool import MAX_POOLED_CONNECTIONS, smtp_pool
 
 def send_factoring_packet_email(to_email, subject, body, attachments):
     msg = EmailMessage()
@@ -25,6 +30,31 @@ def send_factoring_packet_email(to_email, subject, body, attachments):
         smtp.send_message(msg)
 
 
+class SmtpConfig(NamedTuple):
+    host: str | None
+    port: int
+    user: str | None
+    password: str | None
+    domain: str
+
+
+@lru_cache(maxsize=1)
+def _smtp_settings() -> SmtpConfig:
+    return SmtpConfig(
+        host=os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST"),
+        port=int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465"),
+        user=os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER"),
+        password=os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS"),
+        domain=os.getenv("EMAIL_DOMAIN", "gcdloads.com"),
+    )
+
+
+# Outbound sends get their own workers, sized to the SMTP pool, so a burst
+# of mail never queues behind (or starves) the default to_thread executor.
+_SMTP_EXECUTOR = ThreadPoolExecutor(max_workers=MAX_POOLED_CONNECTIONS, thread_name_prefix="smtp")
+
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]")
+
 SOURCE_TAG_ALIASES = {
     "dat_one": "dat",
     "datpower": "dat",
@@ -35,16 +65,18 @@ SOURCE_TAG_ALIASES = {
 }
 
 
+@lru_cache(maxsize=512)
 def _normalize_sender_handle(value: str) -> str:
-    return re.sub(r"[^a-z0-9]", "", (value or "").lower()) or "dispatch"
+    return _NON_ALNUM_RE.sub("", (value or "").lower()) or "dispatch"
 
 
+@lru_cache(maxsize=512)
 def _normalize_source_tag(load_source: str | None) -> str | None:
     raw = (load_source or "").strip().lower()
     if not raw:
         return None
     mapped = SOURCE_TAG_ALIASES.get(raw, raw)
-    normalized = re.sub(r"[^a-z0-9]", "", mapped)
+    normalized = _NON_ALNUM_RE.sub("", mapped)
     return normalized or None
 
 
@@ -85,36 +117,74 @@ def _build_sender_token(
     return f"{clean_handle}+{safe_load_ref}@{email_domain}"
 
 
+_FOOTER_HEIGHT = 30
+_WATERMARK_DOCINFO_KEY = "/GCDWatermark"
+
+
+def _footer_overlay(page_width: float, footer_text: str) -> pikepdf.Pdf:
+    overlay_stream = io.BytesIO()
+    overlay_canvas = canvas.Canvas(overlay_stream, pagesize=(page_width, _FOOTER_HEIGHT))
+    overlay_canvas.setFont("Helvetica", 8)
+    overlay_canvas.drawString(24, 18, footer_text[:220])
+    overlay_canvas.save()
+    overlay_stream.seek(0)
+    return pikepdf.open(overlay_stream)
+
+
 def _add_pdf_footer_watermark(file_bytes: bytes, footer_text: str) -> bytes:
     if not footer_text:
         return file_bytes
 
     try:
-        reader = PdfReader(io.BytesIO(file_bytes))
+        pdf = pikepdf.open(io.BytesIO(file_bytes))
     except Exception:
         return file_bytes
 
-    writer = PdfWriter()
-
-    for page in reader.pages:
-        page_width = float(page.mediabox.width)
-        page_height = float(page.mediabox.height)
-
-        overlay_stream = io.BytesIO()
-        overlay_canvas = canvas.Canvas(overlay_stream, pagesize=(page_width, page_height))
-        overlay_canvas.setFont("Helvetica", 8)
-        overlay_canvas.drawString(24, 18, footer_text[:220])
-        overlay_canvas.save()
+    # The footer is a strip as wide as the page, drawn once per distinct page
+    # width and stamped onto each page as a form XObject by qpdf — page
+    # content streams are never parsed or rewritten in Python.
+    overlays: dict[float, pikepdf.Pdf] = {}
+    try:
+        # Retries re-send documents that already carry this footer; the
+        # marker written below lets them skip the overlay and the rewrite.
+        if str(pdf.docinfo.get(_WATERMARK_DOCINFO_KEY, "")) == footer_text[:220]:
+            return file_bytes
+
+        for page in pdf.pages:
+            page_width = float(page.mediabox[2]) - float(page.mediabox[0])
+            overlay = overlays.get(page_width)
+            if overlay is None:
+                overlay = overlays[page_width] = _footer_overlay(page_width, footer_text)
+            page.add_overlay(overlay.pages[0], pikepdf.Rectangle(0, 0, page_width, _FOOTER_HEIGHT))
+
+        pdf.docinfo[_WATERMARK_DOCINFO_KEY] = footer_text[:220]
+        output = io.BytesIO()
+        pdf.save(output, linearize=False, compress_streams=True)
+        return output.getvalue()
+    finally:
+        for overlay in overlays.values():
+            overlay.close()
+        pdf.close()
+
+
+def _new_message(subject: str, to: str, body: str, *, from_handle: str = "dispatch") -> EmailMessage:
+    message = EmailMessage()
+    message["Subject"] = subject
+    message["From"] = f"{from_handle}@{_smtp_settings().domain}"
+    message["To"] = to
+    message.set_content(body)
+    return message
 
-        overlay_stream.seek(0)
-        overlay_pdf = PdfReader(overlay_stream)
-        if overlay_pdf.pages:
-            page.merge_page(overlay_pdf.pages[0])
-        writer.add_page(page)
 
-    output = io.BytesIO()
-    writer.write(output)
-    return output.getvalue()
+def _attach_pdf_file(message: EmailMessage, path: Path) -> None:
+    # Encode straight from a read-only mapping so the file is never copied
+    # into a bytes object before base64 (mmap refuses zero-length files).
+    with path.open("rb") as handle:
+        if os.fstat(handle.fileno()).st_size == 0:
+            message.add_attachment(b"", maintype="application", subtype="pdf", filename=path.name)
+            return
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped, memoryview(mapped) as view:
+            message.add_attachment(view, maintype="application", subtype="pdf", filename=path.name)
 
 
 def send_negotiation_email(
@@ -125,17 +195,13 @@ def send_negotiation_email(
     driver_handle: str,
     load_source: str | None = None,
 ) -> None:
-    smtp_host = os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST")
-    smtp_port = int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465")
-    smtp_user = os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER")
-    smtp_password = os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+    cfg = _smtp_settings()
 
-    if not all([smtp_host, smtp_user, smtp_password, broker_email]):
+    if not all([cfg.host, cfg.user, cfg.password, broker_email]):
         return
 
     clean_handle = _normalize_sender_handle(driver_handle)
-    from_token = f"{clean_handle}+{load_id}@{email_domain}"
+    from_token = f"{clean_handle}+{load_id}@{cfg.domain}"
     tagged_broker_email = add_load_board_tag(broker_email, load_source)
 
     message = EmailMessage()
@@ -152,9 +218,8 @@ def send_negotiation_email(
         )
     )
 
-    with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as client:
-        client.login(smtp_user, smtp_password)
-        client.send_message(message, from_addr=smtp_user, to_addrs=[tagged_broker_email])
+    with smtp_pool.connection(cfg.host, cfg.port, cfg.user, cfg.password) as client:
+        client.send_message(message, from_addr=cfg.user, to_addrs=[tagged_broker_email])
 
 
 def send_quick_reply_email(
@@ -169,17 +234,13 @@ def send_quick_reply_email(
     negotiation_id: int | None = None,
     watermark_footer_text: str | None = None,
 ) -> bool:
-    smtp_host = os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST")
-    smtp_port = int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465")
-    smtp_user = os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER")
-    smtp_password = os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+    cfg = _smtp_settings()
 
-    if not all([smtp_host, smtp_user, smtp_password, broker_email, driver_handle, load_ref]):
+    if not all([cfg.host, cfg.user, cfg.password, broker_email, driver_handle, load_ref]):
         return False
 
     from_token = _build_sender_token(
-        email_domain=email_domain,
+        email_domain=cfg.domain,
         driver_handle=driver_handle,
         load_ref=load_ref,
         negotiation_id=negotiation_id,
@@ -199,16 +260,20 @@ def send_quick_reply_email(
     message.set_content(body)
 
     for attachment_path in attachment_paths or []:
+        if not (settings.WATERMARK_ENABLED and watermark_footer_text and attachment_path.suffix.lower() == ".pdf"):
+            try:
+                _attach_pdf_file(message, attachment_path)
+            except OSError:
+                pass
+            continue
+
         try:
             file_bytes = attachment_path.read_bytes()
         except OSError:
             continue
 
-        if settings.WATERMARK_ENABLED and watermark_footer_text and attachment_path.suffix.lower() == ".pdf":
-            file_bytes = _add_pdf_footer_watermark(file_bytes, watermark_footer_text)
-
         message.add_attachment(
-            file_bytes,
+            _add_pdf_footer_watermark(file_bytes, watermark_footer_text),
             maintype="application",
             subtype="pdf",
             filename=attachment_path.name,
@@ -229,9 +294,8 @@ def send_quick_reply_email(
             filename=filename,
         )
 
-    with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as client:
-        client.login(smtp_user, smtp_password)
-        client.send_message(message, from_addr=smtp_user, to_addrs=[tagged_broker_email])
+    with smtp_pool.connection(cfg.host, cfg.port, cfg.user, cfg.password) as client:
+        client.send_message(message, from_addr=cfg.user, to_addrs=[tagged_broker_email])
 
     return True
 
@@ -247,47 +311,44 @@ async def send_outbound_email(
     load_source: str | None = None,
     negotiation_id: int | None = None,
 ) -> bool:
-    return await asyncio.to_thread(
-        send_quick_reply_email,
-        broker_email=recipient,
-        load_ref=load_ref,
-        driver_handle=driver_handle,
-        subject=subject,
-        body=body,
-        attachment_paths=attachment_paths,
-        attachment_blobs=attachment_blobs,
-        load_source=load_source,
-        negotiation_id=negotiation_id,
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _SMTP_EXECUTOR,
+        partial(
+            send_quick_reply_email,
+            broker_email=recipient,
+            load_ref=load_ref,
+            driver_handle=driver_handle,
+            subject=subject,
+            body=body,
+            attachment_paths=attachment_paths,
+            attachment_blobs=attachment_blobs,
+            load_source=load_source,
+            negotiation_id=negotiation_id,
+        ),
     )
 
 
 def send_magic_link_email(to_email: str, verify_url: str) -> bool:
-    smtp_host = os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST")
-    smtp_port = int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465")
-    smtp_user = os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER")
-    smtp_password = os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+    cfg = _smtp_settings()
 
-    if not all([smtp_host, smtp_user, smtp_password, to_email, verify_url]):
+    if not all([cfg.host, cfg.user, cfg.password, to_email, verify_url]):
         return False
 
-    message = EmailMessage()
-    message["Subject"] = "Your Green Candle sign-in link"
-    message["From"] = f"dispatch@{email_domain}"
-    message["To"] = to_email
-    message.set_content(
+    message = _new_message(
+        "Your Green Candle sign-in link",
+        to_email,
         (
             "Welcome to Green Candle Dispatch.\n\n"
             "Use this secure sign-in link (expires soon):\n"
             f"{verify_url}\n\n"
             "If you did not request this, you can ignore this email."
-        )
+        ),
     )
 
     try:
-        with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as client:
-            client.login(smtp_user, smtp_password)
-            client.send_message(message, from_addr=smtp_user, to_addrs=[to_email])
+        with smtp_pool.connection(cfg.host, cfg.port, cfg.user, cfg.password) as client:
+            client.send_message(message, from_addr=cfg.user, to_addrs=[to_email])
     except Exception:
         return False
 
@@ -310,20 +371,14 @@ def send_century_referral_email(
     current_factoring_company: str | None = None,
     preferred_funding_speed: str | None = None,
 ) -> bool:
-    smtp_host = os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST")
-    smtp_port = int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465")
-    smtp_user = os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER")
-    smtp_password = os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+    cfg = _smtp_settings()
 
-    if not all([smtp_host, smtp_user, smtp_password, to_email]):
+    if not all([cfg.host, cfg.user, cfg.password, to_email]):
         return False
 
-    message = EmailMessage()
-    message["Subject"] = f"New Century Referral - MC# {mc_number} DOT# {dot_number}"
-    message["From"] = f"dispatch@{email_domain}"
-    message["To"] = to_email
-    message.set_content(
+    message = _new_message(
+        f"New Century Referral - MC# {mc_number} DOT# {dot_number}",
+        to_email,
         "\n".join(
             [
                 "New Century Finance referral submitted:",
@@ -341,13 +396,12 @@ def send_century_referral_email(
                 f"Current Factoring Company: {current_factoring_company or ''}",
                 f"Preferred Funding Speed: {preferred_funding_speed or ''}",
             ]
-        )
+        ),
     )
 
     try:
-        with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as client:
-            client.login(smtp_user, smtp_password)
-            client.send_message(message, from_addr=smtp_user, to_addrs=[to_email])
+        with smtp_pool.connection(cfg.host, cfg.port, cfg.user, cfg.password) as client:
+            client.send_message(message, from_addr=cfg.user, to_addrs=[to_email])
     except Exception:
         return False
 
@@ -355,32 +409,25 @@ def send_century_referral_email(
 
 
 def send_century_approval_email(*, to_email: str, driver_name: str | None = None) -> bool:
-    smtp_host = os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST")
-    smtp_port = int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465")
-    smtp_user = os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER")
-    smtp_password = os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+    cfg = _smtp_settings()
 
-    if not all([smtp_host, smtp_user, smtp_password, to_email]):
+    if not all([cfg.host, cfg.user, cfg.password, to_email]):
         return False
 
-    message = EmailMessage()
-    message["Subject"] = "Century approval complete - your Green Candle account is active"
-    message["From"] = f"dispatch@{email_domain}"
-    message["To"] = to_email
-    message.set_content(
+    message = _new_message(
+        "Century approval complete - your Green Candle account is active",
+        to_email,
         (
             f"Hi {(driver_name or 'Driver').strip()},\n\n"
             "Your Century setup has been approved and your account is now active.\n"
             "Log in with your magic link to continue dispatching.\n\n"
             "Green Candle Dispatch"
-        )
+        ),
     )
 
     try:
-        with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as client:
-            client.login(smtp_user, smtp_password)
-            client.send_message(message, from_addr=smtp_user, to_addrs=[to_email])
+        with smtp_pool.connection(cfg.host, cfg.port, cfg.user, cfg.password) as client:
+            client.send_message(message, from_addr=cfg.user, to_addrs=[to_email])
     except Exception:
         return False
 
@@ -403,14 +450,10 @@ def send_driver_alert_email(
     Only called for NEEDS_APPROVAL and AUTO_SENT — never for SAVED_ONLY.
     From address is always the system dispatch identity, never a driver handle.
     """
-    smtp_host = os.getenv("MXROUTE_SMTP_HOST") or os.getenv("EMAIL_HOST")
-    smtp_port = int(os.getenv("MXROUTE_SMTP_PORT") or os.getenv("EMAIL_PORT") or "465")
-    smtp_user = os.getenv("MXROUTE_SMTP_USER") or os.getenv("EMAIL_USER")
-    smtp_password = os.getenv("MXROUTE_SMTP_PASSWORD") or os.getenv("EMAIL_PASS")
-    email_domain = os.getenv("EMAIL_DOMAIN", "gcdloads.com")
+    cfg = _smtp_settings()
     app_url = dashboard_url or os.getenv("APP_URL", "https://codriverfreight.com")
 
-    if not all([smtp_host, smtp_user, smtp_password, to_email]):
+    if not all([cfg.host, cfg.user, cfg.password, to_email]):
         return False
 
     name = (driver_name or "Driver").strip()
@@ -438,16 +481,11 @@ def send_driver_alert_email(
             "Green Candle Dispatch"
         )
 
-    message = EmailMessage()
-    message["Subject"] = subject
-    message["From"] = f"dispatch@{email_domain}"
-    message["To"] = to_email
-    message.set_content(body)
+    message = _new_message(subject, to_email, body)
 
     try:
-        with smtplib.SMTP_SSL(smtp_host, smtp_port, timeout=20) as client:
-            client.login(smtp_user, smtp_password)
-            client.send_message(message, from_addr=smtp_user, to_addrs=[to_email])
+        with smtp_pool.connection(cfg.host, cfg.port, cfg.user, cfg.password) as client:
+            client.send_message(message, from_addr=cfg.user, to_addrs=[to_email])
     except Exception:
         return False
 
@@ -1,22 +1,70 @@
 import re
 from datetime import datetime, timezone
+from functools import lru_cache
 from typing import Any
 
+import orjson
 import requests
-from sqlalchemy import text
+from requests.adapters import HTTPAdapter
+from sqlalchemy import Integer, bindparam, text
 from sqlalchemy.orm import Session
+from urllib3.util.retry import Retry
 
 from app.core.config import settings as core_settings
-from app.services.document_registry import get_active_documents
+from app.services.document_registry import get_active_documents_multi
 from app.services.packet_storage import generate_presigned_get_url
 
+_PACKET_DOC_TYPES = ("W9", "INSURANCE", "AUTHORITY")
+_COMPOSED_PACKET_DOC_TYPES = ("NEGOTIATION_PACKET", "FACTOR_PACKET")
+
+# Deletes every ASCII character except digits, "." and "-"; the regex only
+# runs when non-ASCII characters (e.g. "€") survive the translate.
+_MONEY_ASCII_DELETE = dict.fromkeys((i for i in range(128) if chr(i) not in "0123456789.-"), None)
+_MONEY_STRIP_RE = re.compile(r"[^0-9.\-]")
+
+# Shared keep-alive session so each submit reuses a warm TCP/TLS connection
+# to the factoring API. Only connection errors are retried (the request never
+# reached the server); read and status retries are off because a submission
+# is not idempotent and must never be sent twice.
+_FACTORING_SESSION = requests.Session()
+_FACTORING_SESSION.mount(
+    "https://",
+    HTTPAdapter(
+        pool_connections=8,
+        pool_maxsize=8,
+        max_retries=Retry(total=2, connect=2, read=0, status=0, backoff_factor=0.2),
+    ),
+)
+
+
+_SELECT_NEGOTIATION = text("""
+    SELECT n.id, n.driver_id, n.load_id, n.status, n.current_offer, n.factoring_status,
+           l.ref_id, l.origin, l.destination, l.price
+    FROM negotiations n
+    JOIN loads l ON l.id = n.load_id
+    WHERE n.id = :negotiation_id
+      AND n.driver_id = :driver_id
+    LIMIT 1
+""").bindparams(bindparam("negotiation_id", type_=Integer), bindparam("driver_id", type_=Integer))
+
+_MARK_NEGOTIATION_SENT = text("""
+    UPDATE negotiations
+    SET factoring_status = 'SENT',
+        factored_at = NOW(),
+        updated_at = NOW()
+    WHERE id = :negotiation_id
+      AND driver_id = :driver_id
+""").bindparams(bindparam("negotiation_id", type_=Integer), bindparam("driver_id", type_=Integer))
+
 
 def _money_to_float(raw_value: Any) -> float:
     if raw_value is None:
         return 0.0
     if isinstance(raw_value, (int, float)):
         return float(raw_value)
-    cleaned = re.sub(r"[^0-9.\-]", "", str(raw_value))
+    cleaned = str(raw_value).translate(_MONEY_ASCII_DELETE)
+    if not cleaned.isascii():
+        cleaned = _MONEY_STRIP_RE.sub("", cleaned)
     try:
         return float(cleaned)
     except ValueError:
@@ -29,24 +77,27 @@ def _attachment_url(bucket: str | None, file_key: str) -> str | None:
     return None
 
 
-def _factoring_auth_headers() -> dict[str, str]:
+@lru_cache(maxsize=1)
+def _factoring_auth_header_items() -> tuple[tuple[str, str], ...]:
     api_key = (core_settings.FACTORING_API_KEY or "").strip()
     auth_header = (core_settings.FACTORING_API_AUTH_HEADER or "Authorization").strip()
     auth_scheme = (core_settings.FACTORING_API_AUTH_SCHEME or "Bearer").strip()
 
     if not api_key:
-        return {}
+        return ()
 
     if auth_header.lower() == "authorization":
         value = f"{auth_scheme} {api_key}" if auth_scheme else api_key
     else:
         value = api_key
 
-    return {
-        "Content-Type": "application/json",
-        "Accept": "application/json",
-        auth_header: value,
-    }
+    return ((auth_header, value),)
+
+
+def _factoring_auth_headers() -> dict[str, str]:
+    # Settings are static, so the header values are computed once; callers
+    # still get their own dict and cannot leak edits into later requests.
+    return dict(_factoring_auth_header_items())
 
 
 def _post_to_factoring_api(payload: dict[str, Any]) -> dict[str, Any]:
@@ -54,16 +105,23 @@ def _post_to_factoring_api(payload: dict[str, Any]) -> dict[str, Any]:
     if not api_url:
         return {"ok": False, "message": "factoring_api_url_not_configured"}
 
-    headers = _factoring_auth_headers()
-    if not headers:
+    auth_headers = _factoring_auth_headers()
+    if not auth_headers:
         return {"ok": False, "message": "factoring_api_key_not_configured"}
+    # The body is pre-encoded with orjson and sent as data=, so requests will
+    # not add the JSON content type that json= used to set.
+    headers = {
+        "Content-Type": "application/json",
+        "Accept": "application/json",
+        **auth_headers,
+    }
 
     timeout_seconds = max(int(core_settings.FACTORING_API_TIMEOUT_SECONDS or 20), 1)
 
     try:
-        response = requests.post(
+        response = _FACTORING_SESSION.post(
             api_url,
-            json=payload,
+            data=orjson.dumps(payload),
             headers=headers,
             timeout=timeout_seconds,
         )
@@ -76,7 +134,7 @@ def _post_to_factoring_api(payload: dict[str, Any]) -> dict[str, Any]:
 
     response_body: Any
     try:
-        response_body = response.json()
+        response_body = orjson.loads(response.content)
     except ValueError:
         response_body = {"raw": response.text[:1000]}
 
@@ -108,17 +166,7 @@ def send_negotiation_to_factoring(
     dry_run: bool = True,
 ) -> dict[str, Any]:
     negotiation_row = db.execute(
-        text(
-            """
-            SELECT n.id, n.driver_id, n.load_id, n.status, n.current_offer, n.factoring_status,
-                   l.ref_id, l.origin, l.destination, l.price
-            FROM negotiations n
-            JOIN loads l ON l.id = n.load_id
-            WHERE n.id = :negotiation_id
-              AND n.driver_id = :driver_id
-            LIMIT 1
-            """
-        ),
+        _SELECT_NEGOTIATION,
         {
             "negotiation_id": negotiation_id,
             "driver_id": driver_id,
@@ -130,23 +178,34 @@ def send_negotiation_to_factoring(
     if (negotiation_row.get("factoring_status") or "").upper() == "SENT":
         return {"ok": True, "message": "already_sent_to_factoring", "attachments": []}
 
-    bol_docs = get_active_documents(
+    # One query for every document the submission can use: the driver-level
+    # carrier packet plus this negotiation's BOL, rate con and composed packet.
+    docs = get_active_documents_multi(
         db,
         driver_id=driver_id,
         negotiation_id=negotiation_id,
-        doc_types=["BOL_PDF"],
+        doc_types=[*_PACKET_DOC_TYPES, "BOL_PDF", "RATECON", *_COMPOSED_PACKET_DOC_TYPES],
     )
+    bol_docs: list[dict[str, Any]] = []
+    ratecon_docs: list[dict[str, Any]] = []
+    composed_packet_docs: list[dict[str, Any]] = []
+    packet_map: dict[str, dict[str, Any]] = {}
+    for doc in docs:
+        doc_type = doc["doc_type"]
+        if doc["negotiation_id"] is None:
+            if doc_type in _PACKET_DOC_TYPES:
+                packet_map[doc_type] = doc
+        elif doc_type == "BOL_PDF":
+            bol_docs.append(doc)
+        elif doc_type == "RATECON":
+            ratecon_docs.append(doc)
+        elif doc_type in _COMPOSED_PACKET_DOC_TYPES:
+            composed_packet_docs.append(doc)
+
     if not bol_docs:
         return {"ok": False, "message": "upload_bol_first"}
 
-    packet_docs = get_active_documents(
-        db,
-        driver_id=driver_id,
-        negotiation_id=None,
-        doc_types=["W9", "INSURANCE", "AUTHORITY"],
-    )
-    packet_map = {doc["doc_type"]: doc for doc in packet_docs}
-    missing_packet_types = [doc_type for doc_type in ("W9", "INSURANCE", "AUTHORITY") if doc_type not in packet_map]
+    missing_packet_types = [doc_type for doc_type in _PACKET_DOC_TYPES if doc_type not in packet_map]
     if missing_packet_types:
         return {
             "ok": False,
@@ -154,21 +213,8 @@ def send_negotiation_to_factoring(
             "missing": missing_packet_types,
         }
 
-    ratecon_docs = get_active_documents(
-        db,
-        driver_id=driver_id,
-        negotiation_id=negotiation_id,
-        doc_types=["RATECON"],
-    )
-
     attachments: list[dict[str, str]] = []
 
-    composed_packet_docs = get_active_documents(
-        db,
-        driver_id=driver_id,
-        negotiation_id=negotiation_id,
-        doc_types=["NEGOTIATION_PACKET", "FACTOR_PACKET"],
-    )
     if composed_packet_docs:
         packet_url = _attachment_url(composed_packet_docs[0].get("bucket"), composed_packet_docs[0]["file_key"])
         if packet_url:
@@ -183,7 +229,7 @@ def send_negotiation_to_factoring(
         attachments.append({"type": "BOL", "url": bol_url, "note": "Processed bill of lading"})
 
     if not attachments or attachments[0].get("type") != "PACKET":
-        for packet_doc_type in ("W9", "INSURANCE", "AUTHORITY"):
+        for packet_doc_type in _PACKET_DOC_TYPES:
             packet_doc = packet_map[packet_doc_type]
             url = _attachment_url(packet_doc.get("bucket"), packet_doc["file_key"])
             if not url:
@@ -233,16 +279,7 @@ def send_negotiation_to_factoring(
             }
 
         db.execute(
-            text(
-                """
-                UPDATE negotiations
-                SET factoring_status = 'SENT',
-                    factored_at = NOW(),
-                    updated_at = NOW()
-                WHERE id = :negotiation_id
-                  AND driver_id = :driver_id
-                """
-            ),
+            _MARK_NEGOTIATION_SENT,
             {
                 "negotiation_id": negotiation_id,
                 "driver_id": driver_id,
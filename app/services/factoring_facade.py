@@ -61,20 +61,7 @@ def submit_to_factoring(
             negotiation_id, driver_id, dry_run,
         )
         from app.services.factoring_send import send_to_factoring as _send_email
-        import asyncio
-        try:
-            result = asyncio.get_event_loop().run_until_complete(
-                _send_email(db, driver_id, negotiation_id, force=force)
-            )
-        except RuntimeError:
-            # Already inside a running event loop (FastAPI async context)
-            import concurrent.futures
-            with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
-                future = pool.submit(
-                    asyncio.run,
-                    _send_email(db, driver_id, negotiation_id, force=force),
-                )
-                result = future.result()
+        result = _send_email(db, driver_id, negotiation_id, force=force)
         result.setdefault("path", "email")
         return result
 
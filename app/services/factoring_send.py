@@ -1,17 +1,30 @@
 from datetime import datetime
+from sqlalchemy import text
 from sqlalchemy.exc import IntegrityError
 from app.services.email import send_factoring_packet_email
 from app.core.config import settings as _core_settings
 MAX_EMAIL_ATTACHMENT_BYTES = _core_settings.MAX_EMAIL_ATTACHMENT_BYTES
-from app.services.storage import get_object
+from app.services.packet_storage import read_bytes_within_limit
 from app.models.driver import Driver
 from app.models.negotiation import Negotiation
 from app.models.driver_documents import DriverDocument
 from app.models.factoring_submissions import FactoringSubmission
 
 REQUIRED_DOCS = ['W9', 'INSURANCE', 'AUTHORITY']
+_REQUIRED_DOCS = frozenset(REQUIRED_DOCS)
+_NEGOTIATION_DOC_TYPES = ['BOL_RAW', 'BOL_PACKET', 'NEGOTIATION_PACKET']
 
-async def send_to_factoring(db, driver_id, negotiation_id, force=False):
+_ACTIVE_DOCS_SQL = text("""
+    SELECT doc_type, negotiation_id, bucket, file_key
+    FROM driver_documents
+    WHERE driver_id = :driver_id
+      AND is_active = TRUE
+      AND (doc_type = ANY(:packet_types)
+           OR (negotiation_id = :negotiation_id AND doc_type = ANY(:neg_types)))
+    ORDER BY id DESC
+""")
+
+def send_to_factoring(db, driver_id, negotiation_id, force=False):
     driver = db.query(Driver).filter(Driver.id == driver_id).first()
     if not driver:
         return {'ok': False, 'status': 'error', 'message': 'Driver not found'}
@@ -20,17 +33,27 @@ async def send_to_factoring(db, driver_id, negotiation_id, force=False):
     if not driver.factor_packet_email:
         return {'ok': False, 'status': 'blocked', 'message': 'Missing factoring email', 'redirect_url': '/onboarding/factoring'}
 
-    docs = db.query(DriverDocument).filter(DriverDocument.driver_id == driver_id, DriverDocument.is_active == True).all()
-    doc_types = {d.doc_type for d in docs}
-    missing_docs = [d for d in REQUIRED_DOCS if d not in doc_types]
+    # One round trip for the carrier packet docs plus this negotiation's BOL and composed packet
+    rows = db.execute(_ACTIVE_DOCS_SQL, {'driver_id': driver_id, 'negotiation_id': negotiation_id, 'packet_types': REQUIRED_DOCS, 'neg_types': _NEGOTIATION_DOC_TYPES}).all()
+    doc_types = set()
+    bol_doc = None
+    packet_doc = None
+    for row in rows:
+        if row.doc_type in _REQUIRED_DOCS:
+            doc_types.add(row.doc_type)
+        elif row.doc_type == 'NEGOTIATION_PACKET':
+            if packet_doc is None:
+                packet_doc = row
+        elif bol_doc is None:
+            bol_doc = row
+
+    missing_docs = _REQUIRED_DOCS - doc_types
     if missing_docs:
-        return {'ok': False, 'status': 'blocked', 'message': f'Missing docs: {missing_docs}', 'redirect_url': '/onboarding/step3'}
+        return {'ok': False, 'status': 'blocked', 'message': f'Missing docs: {[d for d in REQUIRED_DOCS if d in missing_docs]}', 'redirect_url': '/onboarding/step3'}
 
-    bol_doc = db.query(DriverDocument).filter(DriverDocument.negotiation_id == negotiation_id, DriverDocument.doc_type.in_(['BOL_RAW', 'BOL_PACKET']), DriverDocument.is_active == True).first()
     if not bol_doc:
         return {'ok': False, 'status': 'blocked', 'message': 'Missing BOL document', 'redirect_url': '/paperwork'}
 
-    packet_doc = db.query(DriverDocument).filter(DriverDocument.negotiation_id == negotiation_id, DriverDocument.doc_type == 'NEGOTIATION_PACKET', DriverDocument.is_active == True).first()
     if not packet_doc or force:
         # Compose full packet (call compose logic/service)
         # This is a placeholder; actual compose logic should be called here
@@ -38,10 +61,14 @@ async def send_to_factoring(db, driver_id, negotiation_id, force=False):
         if not packet_doc:
             return {'ok': False, 'status': 'blocked', 'message': 'Failed to compose full packet', 'redirect_url': '/paperwork'}
 
-    # Size guard
-    packet_bytes = get_object(packet_doc.bucket, packet_doc.file_key)
-    if len(packet_bytes) > MAX_EMAIL_ATTACHMENT_BYTES:
+    # Size guard: stat/HEAD first so an oversized packet is never downloaded
+    packet_bytes, too_large = read_bytes_within_limit(
+        packet_doc.file_key, bucket=packet_doc.bucket, max_bytes=MAX_EMAIL_ATTACHMENT_BYTES
+    )
+    if too_large:
         return {'ok': False, 'status': 'blocked', 'message': 'Packet too large to send', 'code': 413}
+    if packet_bytes is None:
+        return {'ok': False, 'status': 'error', 'message': 'Packet file not found'}
 
     # Upsert submission
     submission = db.query(FactoringSubmission).filter(FactoringSubmission.negotiation_id == negotiation_id).first()
@@ -3,6 +3,7 @@ from __future__ import annotations
 import calendar
 from datetime import datetime, timezone
 from decimal import Decimal, ROUND_HALF_UP
+from functools import lru_cache
 
 from sqlalchemy import text
 from sqlalchemy.orm import Session
@@ -11,7 +12,11 @@ from app.core.config import settings
 
 
 CENT = Decimal("0.01")
+_ZERO = Decimal("0.00")
 
+# Deletes every ASCII character except digits and "."; non-ASCII input that
+# survives falls back to the isdigit() filter.
+_LOAD_VALUE_ASCII_DELETE = dict.fromkeys((i for i in range(128) if chr(i) not in "0123456789."), None)
 
 def _add_months(dt: datetime, months: int) -> datetime:
     month_index = dt.month - 1 + months
@@ -29,6 +34,13 @@ def _money(value: Decimal) -> Decimal:
     return value.quantize(CENT, rounding=ROUND_HALF_UP)
 
 
+@lru_cache(maxsize=32)
+def _rate(value: str | int | float | Decimal) -> Decimal:
+    # Settings are read at call time (so patched settings apply) but each
+    # distinct value is only parsed once.
+    return _to_decimal(value)
+
+
 def _parse_load_value(load_value: str | int | float | Decimal) -> Decimal:
     if isinstance(load_value, Decimal):
         return _money(load_value)
@@ -36,17 +48,19 @@ def _parse_load_value(load_value: str | int | float | Decimal) -> Decimal:
         return _money(_to_decimal(load_value))
 
     raw = str(load_value or "").strip()
-    clean = "".join(char for char in raw if char.isdigit() or char == ".")
+    clean = raw.translate(_LOAD_VALUE_ASCII_DELETE)
+    if not clean.isascii():
+        clean = "".join(char for char in clean if char.isdigit() or char == ".")
     if not clean:
-        return Decimal("0.00")
+        return _ZERO
     return _money(_to_decimal(clean))
 
 
 def _compute_slices(total_fee: Decimal) -> dict[str, Decimal]:
     # driver_credits = driver's revenue share slice (accounting), not a wallet.
-    slice_driver_credits = _money(total_fee * _to_decimal(settings.SLICE_DRIVER_CREDITS_RATE))
-    slice_infra_reserve = _money(total_fee * _to_decimal(settings.SLICE_INFRA_RESERVE_RATE))
-    slice_treasury = _money(total_fee * _to_decimal(settings.SLICE_TREASURY_RATE))
+    slice_driver_credits = _money(total_fee * _rate(settings.SLICE_DRIVER_CREDITS_RATE))
+    slice_infra_reserve = _money(total_fee * _rate(settings.SLICE_INFRA_RESERVE_RATE))
+    slice_treasury = _money(total_fee * _rate(settings.SLICE_TREASURY_RATE))
 
     slice_platform_profit = _money(total_fee - slice_driver_credits - slice_infra_reserve - slice_treasury)
 
@@ -65,43 +79,37 @@ def process_load_fees(
     driver_id: int,
     negotiation_id: int,
 ) -> dict[str, float | int | bool]:
-    existing = db.execute(
+    # Idempotency check and referral state in one round trip; the LEFT JOIN
+    # keeps a row (with NULL referral columns) even if the driver is missing.
+    context = db.execute(
         text(
             """
-            SELECT id
-            FROM fee_ledger
-            WHERE negotiation_id = :negotiation_id
-            LIMIT 1
+            SELECT
+                (SELECT id FROM fee_ledger WHERE negotiation_id = :negotiation_id LIMIT 1) AS fee_ledger_id,
+                d.referred_by_id,
+                d.referral_started_at,
+                d.referral_expires_at
+            FROM (SELECT 1 AS one) AS anchor
+            LEFT JOIN drivers d ON d.id = :driver_id
             """
         ),
-        {"negotiation_id": negotiation_id},
+        {"negotiation_id": negotiation_id, "driver_id": driver_id},
     ).first()
-    if existing:
+    if context.fee_ledger_id is not None:
         return {
             "created": False,
-            "fee_ledger_id": int(existing.id),
+            "fee_ledger_id": int(context.fee_ledger_id),
         }
 
     total_load_value = _parse_load_value(load_value)
-    total_fee_collected = _money(total_load_value * _to_decimal(settings.DISPATCH_FEE_RATE))
+    total_fee_collected = _money(total_load_value * _rate(settings.DISPATCH_FEE_RATE))
 
     slices = _compute_slices(total_fee_collected)
     platform_profit_gross = slices["slice_platform_profit"]
 
-    referred_by_row = db.execute(
-        text(
-            """
-            SELECT referred_by_id, referral_started_at, referral_expires_at
-            FROM drivers
-            WHERE id = :driver_id
-            """
-        ),
-        {"driver_id": driver_id},
-    ).first()
-    referred_by_id = int(referred_by_row.referred_by_id) if referred_by_row and referred_by_row.referred_by_id else None
-
-    referral_started_at = getattr(referred_by_row, "referral_started_at", None) if referred_by_row else None
-    referral_expires_at = getattr(referred_by_row, "referral_expires_at", None) if referred_by_row else None
+    referred_by_id = int(context.referred_by_id) if context.referred_by_id else None
+    referral_started_at = context.referral_started_at
+    referral_expires_at = context.referral_expires_at
 
     now_utc = datetime.now(timezone.utc)
 
@@ -137,7 +145,7 @@ def process_load_fees(
             {"driver_id": driver_id},
         )
 
-    referral_bounty_paid = Decimal("0.00")
+    referral_bounty_paid = _ZERO
     referral_is_active = False
     if referred_by_id and referral_expires_at is not None:
         expiry_value = referral_expires_at
@@ -152,13 +160,12 @@ def process_load_fees(
             referral_is_active = now_utc <= expiry_value
 
     if referral_is_active:
-        raw_bounty = _money(total_fee_collected * _to_decimal(settings.REFERRAL_BOUNTY_RATE))
-        bounty_cap = _money(_to_decimal(settings.REFERRAL_BOUNTY_CAP))
-        referral_bounty_paid = min(raw_bounty, bounty_cap)
+        raw_bounty = _money(total_fee_collected * _rate(settings.REFERRAL_BOUNTY_RATE))
+        referral_bounty_paid = min(raw_bounty, _money(_rate(settings.REFERRAL_BOUNTY_CAP)))
 
     slice_platform_profit_net = _money(platform_profit_gross - referral_bounty_paid)
-    if slice_platform_profit_net < Decimal("0.00"):
-        slice_platform_profit_net = Decimal("0.00")
+    if slice_platform_profit_net < _ZERO:
+        slice_platform_profit_net = _ZERO
 
     ledger_insert = db.execute(
         text(
@@ -202,7 +209,7 @@ def process_load_fees(
     ).first()
 
     referral_earnings_id: int | None = None
-    if referral_is_active and referred_by_id and referral_bounty_paid > Decimal("0.00"):
+    if referral_is_active and referred_by_id and referral_bounty_paid > _ZERO:
         referral_insert = db.execute(
             text(
                 """
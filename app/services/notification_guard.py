@@ -10,6 +10,8 @@ Rules enforced here (in order):
   3. Quiet hours: evaluate in driver's local timezone; midnight-crossing windows
      handled correctly.  BROKER_REPLY bypasses quiet hours if driver opted in.
   4. Hourly cap: max EMAIL_CAP_PER_HOUR emails per driver per rolling hour.
+     The count is read by record_notification() in the same statement as the
+     insert and handed to should_email(), which issues no queries itself.
   5. Digest mode: if notif_email_digest is True, only AUTO_SENT fires immediately;
      NEEDS_APPROVAL is suppressed (digest delivery is a separate job, not here).
   6. Deduplication: insert into driver_notifications with a dedupe_key; if the
@@ -19,9 +21,12 @@ Rules enforced here (in order):
 from __future__ import annotations
 
 import logging
-from datetime import datetime, timezone
-from typing import TYPE_CHECKING
+import zoneinfo
+from datetime import datetime, timezone, tzinfo
+from functools import lru_cache
+from typing import TYPE_CHECKING, NamedTuple
 
+import orjson
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
@@ -36,14 +41,46 @@ EMAIL_CAP_PER_HOUR = 3
 # next_step values that bypass quiet hours (driver opted in to urgent alerts)
 URGENT_TYPES = {"BROKER_REPLY"}
 
+# notif_type values that represent an alert email and count towards the cap
+EMAIL_NOTIF_TYPES = frozenset({"LOAD_MATCH", "AUTO_SENT", "BROKER_REPLY"})
+# Bound into the cap count so SQL and the +1 adjustment share one list
+_EMAIL_NOTIF_TYPE_LIST = sorted(EMAIL_NOTIF_TYPES)
+
+
+class RecordedNotification(NamedTuple):
+    """Result of record_notification().
+
+    notification_id is None when the insert was skipped (dedupe hit or error).
+    emails_last_hour counts email-type rows in the rolling hour, including the
+    row just inserted; pass it to should_email() for the hourly cap.
+    """
+
+    notification_id: int | None
+    emails_last_hour: int
+
+    @property
+    def inserted(self) -> bool:
+        return self.notification_id is not None
+
 
 # ── Quiet-hours helper ────────────────────────────────────────────────────────
 
-def _in_quiet_window(driver: "Driver") -> bool:
+@lru_cache(maxsize=128)
+def _tz(name: str) -> tzinfo:
+    """ZoneInfo for name, or UTC if it is not a valid zone; memoized so bad
+    names are not re-resolved against the tz database on every check."""
+    try:
+        return zoneinfo.ZoneInfo(name)
+    except Exception:
+        return timezone.utc
+
+
+def _in_quiet_window(driver: "Driver", now_utc: datetime | None = None) -> bool:
     """Return True if the current moment falls inside the driver's quiet window.
 
     Handles midnight-crossing windows (e.g. quiet_start=22, quiet_end=6).
     Falls back to UTC if the driver's timezone is invalid or unset.
+    Callers that already read the clock can pass it as now_utc.
     """
     quiet_start = driver.notif_quiet_start  # hour 0-23
     quiet_end = driver.notif_quiet_end      # hour 0-23
@@ -51,13 +88,8 @@ def _in_quiet_window(driver: "Driver") -> bool:
     if quiet_start is None or quiet_end is None:
         return False
 
-    try:
-        import zoneinfo
-        tz = zoneinfo.ZoneInfo(driver.timezone or "America/Chicago")
-    except Exception:
-        tz = timezone.utc
-
-    local_hour = datetime.now(tz).hour
+    tz = _tz(driver.timezone or "America/Chicago")
+    local_hour = (now_utc or datetime.now(timezone.utc)).astimezone(tz).hour
 
     if quiet_start < quiet_end:
         # Simple window: e.g. 08:00–20:00
@@ -70,43 +102,27 @@ def _in_quiet_window(driver: "Driver") -> bool:
         return False
 
 
-# ── Hourly cap ────────────────────────────────────────────────────────────────
-
-def _emails_sent_last_hour(db: Session, driver_id: int) -> int:
-    """Count driver_notifications rows created in the last 60 minutes that
-    represent emails (not SAVED_ONLY, not digest-suppressed)."""
-    row = db.execute(
-        text("""
-            SELECT COUNT(*) AS cnt
-            FROM driver_notifications
-            WHERE driver_id  = :driver_id
-              AND created_at >= NOW() - INTERVAL '1 hour'
-              AND notif_type  IN ('LOAD_MATCH', 'AUTO_SENT', 'BROKER_REPLY')
-        """),
-        {"driver_id": driver_id},
-    ).fetchone()
-    return int(row.cnt) if row else 0
-
-
 # ── Main guard ────────────────────────────────────────────────────────────────
 
 def should_email(
-    db: Session,
     driver: "Driver",
     next_step: str,
+    *,
+    emails_last_hour: int,
 ) -> bool:
     """Return True if an alert email should be sent right now.
 
-    Does NOT insert the notification row — call record_notification() for that.
+    Does NOT insert the notification row — call record_notification() first
+    and pass its emails_last_hour here; no query is issued.
     """
     if not getattr(driver, "notif_email_enabled", True):
         return False
 
+    now_utc = datetime.now(timezone.utc)
+
     # Session suppression: driver is actively looking at the dashboard
     if driver.last_seen_at is not None:
-        age_seconds = (
-            datetime.now(timezone.utc) - driver.last_seen_at
-        ).total_seconds()
+        age_seconds = (now_utc - driver.last_seen_at).total_seconds()
         if age_seconds < SESSION_SUPPRESS_MINUTES * 60:
             logger.debug(
                 "notif_guard: suppress email for driver=%s (active %ds ago)",
@@ -115,7 +131,7 @@ def should_email(
             return False
 
     # Quiet hours (urgent types bypass)
-    if next_step not in URGENT_TYPES and _in_quiet_window(driver):
+    if next_step not in URGENT_TYPES and _in_quiet_window(driver, now_utc):
         logger.debug(
             "notif_guard: suppress email for driver=%s (quiet hours)", driver.id
         )
@@ -126,7 +142,7 @@ def should_email(
         return False
 
     # Hourly cap
-    if _emails_sent_last_hour(db, driver.id) >= EMAIL_CAP_PER_HOUR:
+    if emails_last_hour >= EMAIL_CAP_PER_HOUR:
         logger.debug(
             "notif_guard: suppress email for driver=%s (hourly cap reached)", driver.id
         )
@@ -143,35 +159,55 @@ def record_notification(
     message: str,
     payload: dict | None = None,
     dedupe_key: str | None = None,
-) -> bool:
-    """Insert a driver_notifications row.
+) -> RecordedNotification:
+    """Insert a driver_notifications row and read the hourly email count.
 
     If dedupe_key is provided and a row with that key already exists, the insert
-    is silently skipped (ON CONFLICT DO NOTHING) and False is returned.
-    Returns True if a new row was inserted.
+    is silently skipped (ON CONFLICT DO NOTHING) and notification_id is None.
+    The cap count comes back from the same statement, so the guard needs no
+    second round trip.
     """
     try:
-        result = db.execute(
+        # Both CTEs see the same snapshot, so "recent" never includes the row
+        # being inserted; it is added back below when it counts as an email.
+        row = db.execute(
             text("""
-                INSERT INTO driver_notifications
-                    (driver_id, notif_type, message, payload, dedupe_key)
-                VALUES
-                    (:driver_id, :notif_type, :message, :payload::jsonb, :dedupe_key)
-                ON CONFLICT (dedupe_key) WHERE dedupe_key IS NOT NULL
-                DO NOTHING
-                RETURNING id
+                WITH recent AS (
+                    SELECT COUNT(*) AS cnt
+                    FROM driver_notifications
+                    WHERE driver_id  = :driver_id
+                      AND created_at >= NOW() - INTERVAL '1 hour'
+                      AND notif_type  = ANY(:email_types)
+                ),
+                inserted AS (
+                    INSERT INTO driver_notifications
+                        (driver_id, notif_type, message, payload, dedupe_key)
+                    VALUES
+                        (:driver_id, :notif_type, :message, CAST(:payload AS jsonb), :dedupe_key)
+                    ON CONFLICT (dedupe_key) WHERE dedupe_key IS NOT NULL
+                    DO NOTHING
+                    RETURNING id
+                )
+                SELECT (SELECT id FROM inserted) AS id, recent.cnt
+                FROM recent
             """),
             {
                 "driver_id":   driver_id,
                 "notif_type":  notif_type,
                 "message":     message,
-                "payload":     __import__("json").dumps(payload or {}),
+                "payload":     orjson.dumps(payload).decode() if payload else "{}",
                 "dedupe_key":  dedupe_key,
+                "email_types": _EMAIL_NOTIF_TYPE_LIST,
             },
-        )
+        ).fetchone()
         db.commit()
-        return result.fetchone() is not None
     except Exception as exc:
         logger.warning("record_notification failed: %s", exc)
         db.rollback()
-        return False
+        return RecordedNotification(None, 0)
+
+    notification_id = int(row.id) if row.id is not None else None
+    emails_last_hour = int(row.cnt)
+    if notification_id is not None and notif_type in EMAIL_NOTIF_TYPES:
+        emails_last_hour += 1
+    return RecordedNotification(notification_id, emails_last_hour)
@@ -1,9 +1,17 @@
-import json
+from functools import lru_cache
 
+import orjson
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
 
+@lru_cache(maxsize=256)
+def _dump_doc_types(doc_types: tuple[str, ...]) -> str:
+    # Outbound emails carry a handful of recurring attachment manifests, so
+    # each distinct one is serialized once.
+    return orjson.dumps(doc_types).decode()
+
+
 def log_outbound_message(
     db: Session,
     *,
@@ -46,7 +54,7 @@ def log_outbound_message(
             "driver_id": driver_id,
             "recipient": recipient,
             "subject": subject,
-            "attachment_doc_types": json.dumps(attachment_doc_types or []),
+            "attachment_doc_types": _dump_doc_types(tuple(attachment_doc_types)) if attachment_doc_types else "[]",
             "status": status,
             "error_message": error_message,
         },
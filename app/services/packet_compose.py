@@ -3,7 +3,7 @@ import os
 from io import BytesIO
 from pathlib import Path
 
-from PyPDF2 import PdfReader, PdfWriter
+from pypdf import PdfReader, PdfWriter
 from sqlalchemy.orm import Session
 
 from app.services.document_registry import deactivate_active_documents, get_active_documents, upsert_driver_document
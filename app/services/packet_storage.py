@@ -46,7 +46,11 @@ def packet_file_paths_for_driver(driver_id: int, storage_root: str | Path | None
     return [path for path in files if path.exists()]
 
 
+@lru_cache(maxsize=1)
 def _spaces_client():
+    # One client per process: building it (session, endpoint resolution,
+    # credential setup) costs far more than the calls made through it, and
+    # boto3 clients are safe to share across threads.
     config = _storage_config()
     required = [
         config["DO_SPACES_KEY"],
@@ -222,6 +226,70 @@ def read_bytes_by_key(
         return None
 
 
+def object_size_by_key(
+    key: str,
+    *,
+    bucket: str | None = None,
+    local_root: str | Path = "/srv/gcd-data",
+) -> int | None:
+    """Size in bytes of the object read_bytes_by_key() would return, without
+    reading it: a stat for local copies, a HEAD request for Spaces.
+    """
+    if not key:
+        return None
+
+    path_candidate = Path(key)
+    if path_candidate.is_absolute():
+        try:
+            return path_candidate.stat().st_size if path_candidate.exists() else None
+        except Exception:
+            return None
+
+    local_path = Path(local_root) / key
+    try:
+        if local_path.exists():
+            return local_path.stat().st_size
+    except Exception:
+        pass
+
+    resolved_bucket = (bucket or _storage_config().get("DO_SPACES_BUCKET") or "").strip()
+    client = _spaces_client()
+    if client is None or not resolved_bucket:
+        return None
+
+    try:
+        response = client.head_object(Bucket=resolved_bucket, Key=key)
+        return int(response["ContentLength"])
+    except Exception:
+        return None
+
+
+def read_bytes_within_limit(
+    key: str,
+    *,
+    max_bytes: int,
+    bucket: str | None = None,
+    local_root: str | Path = "/srv/gcd-data",
+) -> tuple[bytes | None, bool]:
+    """read_bytes_by_key() with a size cap. Returns (data, too_large).
+
+    The size is checked with object_size_by_key() first, so an oversized
+    object costs a stat/HEAD instead of a full download; when no size is
+    available the downloaded length is checked instead. data is None when
+    the object is too large or cannot be found.
+    """
+    size = object_size_by_key(key, bucket=bucket, local_root=local_root)
+    if size is not None and size > max_bytes:
+        return None, True
+
+    data = read_bytes_by_key(key, bucket=bucket, local_root=local_root)
+    if data is None:
+        return None, False
+    if size is None and len(data) > max_bytes:
+        return None, True
+    return data, False
+
+
 def generate_presigned_get_url(bucket: str, key: str, expires_seconds: int = 3600) -> str | None:
     client = _spaces_client()
     if client is None:
@@ -0,0 +1,242 @@
+"""
+Pooled SMTP_SSL connections for outbound mail.
+
+Opening a connection costs a TCP + TLS handshake and an AUTH exchange, which
+dominates the cost of sending a single message. The send_* helpers in
+app/services/email.py lease an authenticated connection from here and hand it
+back afterwards, so a warm connection only pays the MAIL/RCPT/DATA round trips.
+
+Connections are keyed by (host, port, user), checked with NOOP when leased,
+dropped after sitting idle too long, and recycled after a fixed number of
+messages. At most MAX_POOLED_CONNECTIONS are open at once, leased or idle;
+further callers wait for one to come back. Callers run on several threads
+(the _SMTP_EXECUTOR in email.py and FastAPI's threadpool for synchronous
+sends), so all shared state is guarded.
+
+Pooled connections are PipelinedSMTP clients: when the server advertises
+PIPELINING (RFC 2920), MAIL FROM, RCPT TO and DATA go out in one write and
+their replies are read back together, saving two or more round trips per
+message.
+"""
+import logging
+import re
+import smtplib
+import threading
+import time
+from collections import deque
+from collections.abc import Iterator
+from contextlib import contextmanager
+from dataclasses import dataclass
+
+logger = logging.getLogger(__name__)
+
+MAX_POOLED_CONNECTIONS = 5
+MAX_MESSAGES_PER_CONNECTION = 100
+MAX_IDLE_SECONDS = 60.0
+SMTP_TIMEOUT_SECONDS = 20
+
+_PoolKey = tuple[str, int, str]
+
+_BARE_EOL_RE = re.compile(r"(?:\r\n|\n|\r(?!\n))")
+_LEADING_PERIOD_RE = re.compile(rb"(?m)^\.")
+
+
+class PipelinedSMTP(smtplib.SMTP_SSL):
+    """SMTP_SSL that pipelines the envelope commands when the server allows it."""
+
+    def sendmail(self, from_addr, to_addrs, msg, mail_options=(), rcpt_options=()):
+        self.ehlo_or_helo_if_needed()
+        if not self.has_extn("pipelining") or any(opt.lower() == "smtputf8" for opt in mail_options):
+            return super().sendmail(from_addr, to_addrs, msg, mail_options, rcpt_options)
+
+        if isinstance(msg, str):
+            msg = _BARE_EOL_RE.sub("\r\n", msg).encode("ascii")
+        if isinstance(to_addrs, str):
+            to_addrs = [to_addrs]
+
+        mail_opts = list(mail_options)
+        if self.has_extn("size"):
+            mail_opts.insert(0, f"size={len(msg)}")
+        mail_args = " ".join([f"FROM:{smtplib.quoteaddr(from_addr)}", *mail_opts])
+        rcpt_suffix = "".join(f" {opt}" for opt in rcpt_options)
+        commands = [f"mail {mail_args}\r\n"]
+        commands.extend(f"rcpt TO:{smtplib.quoteaddr(addr)}{rcpt_suffix}\r\n" for addr in to_addrs)
+        commands.append("data\r\n")
+        self.send("".join(commands))
+
+        # Every pipelined command gets a reply; read them all before acting on
+        # any failure so the stream stays in sync.
+        mail_code, mail_resp = self.getreply()
+        rcpt_replies = [self.getreply() for _ in to_addrs]
+        data_code, data_resp = self.getreply()
+
+        senderrs = {
+            addr: (code, resp)
+            for addr, (code, resp) in zip(to_addrs, rcpt_replies)
+            if code not in (250, 251)
+        }
+        if data_code == 354 and (mail_code != 250 or len(senderrs) == len(to_addrs)):
+            # Server opened DATA without a usable envelope; close it out empty.
+            self.send(".\r\n")
+            self.getreply()
+
+        if 421 in (mail_code, data_code) or any(code == 421 for code, _ in rcpt_replies):
+            self.close()
+            if mail_code != 250:
+                raise smtplib.SMTPSenderRefused(mail_code, mail_resp, from_addr)
+            raise smtplib.SMTPRecipientsRefused(senderrs)
+        if mail_code != 250:
+            self._rset()
+            raise smtplib.SMTPSenderRefused(mail_code, mail_resp, from_addr)
+        if len(senderrs) == len(to_addrs):
+            self._rset()
+            raise smtplib.SMTPRecipientsRefused(senderrs)
+        if data_code != 354:
+            self._rset()
+            raise smtplib.SMTPDataError(data_code, data_resp)
+
+        payload = _LEADING_PERIOD_RE.sub(b"..", msg)
+        if not payload.endswith(b"\r\n"):
+            payload += b"\r\n"
+        self.send(payload + b".\r\n")
+        code, resp = self.getreply()
+        if code != 250:
+            if code == 421:
+                self.close()
+            else:
+                self._rset()
+            raise smtplib.SMTPDataError(code, resp)
+        return senderrs
+
+
+@dataclass(slots=True)
+class _PooledConnection:
+    client: PipelinedSMTP
+    key: _PoolKey
+    last_used: float
+    sent: int = 0
+
+
+class SmtpPool:
+    def __init__(self, max_connections: int = MAX_POOLED_CONNECTIONS) -> None:
+        self._max_connections = max_connections
+        self._idle: dict[_PoolKey, deque[_PooledConnection]] = {}
+        self._leased: dict[int, _PooledConnection] = {}
+        self._open = 0
+        self._available = threading.Condition()
+
+    @staticmethod
+    def _close(conn: _PooledConnection) -> None:
+        try:
+            conn.client.quit()
+        except (smtplib.SMTPException, OSError):
+            conn.client.close()
+
+    @staticmethod
+    def _is_alive(conn: _PooledConnection) -> bool:
+        if time.monotonic() - conn.last_used > MAX_IDLE_SECONDS:
+            return False
+        try:
+            return conn.client.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def _release_slot(self) -> None:
+        with self._available:
+            self._open -= 1
+            self._available.notify()
+
+    def _discard(self, conn: _PooledConnection) -> None:
+        self._close(conn)
+        self._release_slot()
+
+    def _pop_other_idle(self) -> _PooledConnection | None:
+        for idle in self._idle.values():
+            if idle:
+                return idle.popleft()
+        return None
+
+    def _reserve(self, key: _PoolKey) -> _PooledConnection | None:
+        """Pop an idle connection for key, or reserve a slot for a new one
+        (returns None). Waits while every slot is leased."""
+        deadline = time.monotonic() + SMTP_TIMEOUT_SECONDS
+        with self._available:
+            while True:
+                idle = self._idle.get(key)
+                if idle:
+                    return idle.pop()
+                if self._open < self._max_connections:
+                    self._open += 1
+                    return None
+                # An idle connection to another server/account holds the slot
+                victim = self._pop_other_idle()
+                if victim is not None:
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise smtplib.SMTPException("SMTP connection pool exhausted")
+                self._available.wait(remaining)
+        # The new connection takes over the victim's slot
+        self._close(victim)
+        return None
+
+    def get_connection(self, host: str, port: int, user: str, password: str) -> PipelinedSMTP:
+        key = (host, port, user)
+
+        while True:
+            conn = self._reserve(key)
+            if conn is None:
+                break
+            if self._is_alive(conn):
+                with self._available:
+                    self._leased[id(conn.client)] = conn
+                return conn.client
+            self._discard(conn)
+
+        try:
+            client = PipelinedSMTP(host, port, timeout=SMTP_TIMEOUT_SECONDS)
+        except Exception:
+            self._release_slot()
+            raise
+        try:
+            client.login(user, password)
+        except Exception:
+            client.close()
+            self._release_slot()
+            raise
+
+        conn = _PooledConnection(client=client, key=key, last_used=time.monotonic())
+        with self._available:
+            self._leased[id(client)] = conn
+        return client
+
+    def return_connection(self, client: PipelinedSMTP, *, discard: bool = False) -> None:
+        with self._available:
+            conn = self._leased.pop(id(client), None)
+        if conn is None:
+            client.close()
+            return
+
+        conn.sent += 1
+        if discard or conn.sent >= MAX_MESSAGES_PER_CONNECTION:
+            self._discard(conn)
+            return
+
+        conn.last_used = time.monotonic()
+        with self._available:
+            self._idle.setdefault(conn.key, deque()).append(conn)
+            self._available.notify()
+
+    @contextmanager
+    def connection(self, host: str, port: int, user: str, password: str) -> Iterator[PipelinedSMTP]:
+        """Lease a connection; it is discarded instead of pooled if the body raises."""
+        client = self.get_connection(host, port, user, password)
+        try:
+            yield client
+        except BaseException:
+            self.return_connection(client, discard=True)
+            raise
+        self.return_connection(client)
+
+
+smtp_pool = SmtpPool()
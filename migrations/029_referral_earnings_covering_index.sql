@@ -0,0 +1,25 @@
+-- Migration 029: Covering index for referral report aggregates
+--
+-- referral_report.get_referral_stats sums amount FILTER (WHERE status = ...)
+-- per referrer_id. Keying on (referrer_id, status) and carrying amount in
+-- INCLUDE lets Postgres answer it with an Index Only Scan instead of heap
+-- fetches for every earning row.
+--
+-- CREATE INDEX CONCURRENTLY and VACUUM cannot run inside a transaction block,
+-- so this file intentionally has no BEGIN/COMMIT. Run it with plain psql:
+--   psql "$DATABASE_URL" -f migrations/029_referral_earnings_covering_index.sql
+--
+-- Verify afterwards with:
+--   EXPLAIN (ANALYZE, BUFFERS)
+--   SELECT SUM(amount) FILTER (WHERE status = 'AVAILABLE'),
+--          SUM(amount) FILTER (WHERE status = 'PENDING'),
+--          COUNT(*)
+--   FROM public.referral_earnings WHERE referrer_id = 1;
+-- Expect: Index Only Scan using idx_referral_earnings_referrer_status_amount
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_referral_earnings_referrer_status_amount
+    ON public.referral_earnings (referrer_id, status)
+    INCLUDE (amount);
+
+-- Refresh the visibility map so the planner can pick the index-only scan.
+VACUUM ANALYZE public.referral_earnings;
@@ -0,0 +1,22 @@
+-- Migration 030: Partial index for the weekly billing pending-invoice scan
+--
+-- billing_repo.get_pending_billing_context reads every driver_invoices row
+-- with status = 'pending' AND billed_week_ending IS NULL, grouped by driver
+-- and filtered on created_at. Those rows are a small, short-lived slice of
+-- the table, so a partial index keeps the scan proportional to unbilled work
+-- rather than to invoice history. fee_amount_cents rides in INCLUDE for the
+-- per-driver SUM.
+--
+-- billing_runs (driver_id, week_ending) needs nothing new: it is already
+-- covered by the uq_billing_runs_driver_week unique constraint from 014.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so this
+-- file intentionally has no BEGIN/COMMIT. Run it with plain psql:
+--   psql "$DATABASE_URL" -f migrations/030_driver_invoices_pending_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_driver_invoices_pending_unbilled
+    ON public.driver_invoices (driver_id, created_at)
+    INCLUDE (fee_amount_cents)
+    WHERE status = 'pending' AND billed_week_ending IS NULL;
+
+ANALYZE public.driver_invoices;
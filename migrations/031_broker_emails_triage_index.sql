@@ -0,0 +1,23 @@
+-- Migration 031: Covering index for the broker triage email lookup
+--
+-- broker_intelligence.triage_broker_contact picks the best email per broker:
+--   SELECT email FROM webwise.broker_emails
+--   WHERE mc_number IN (...)
+--   ORDER BY confidence DESC, created_at DESC, id DESC
+--   LIMIT 1
+-- The existing mc_number index still leaves a sort node per lookup. Matching
+-- the ORDER BY and carrying email in INCLUDE lets Postgres read the top row
+-- per candidate straight from the index with no sort or heap fetch.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so this
+-- file intentionally has no BEGIN/COMMIT. Run it with plain psql:
+--   psql "$DATABASE_URL" -f migrations/031_broker_emails_triage_index.sql
+--
+-- Verify afterwards with EXPLAIN (ANALYZE) on the query above:
+-- Expect: Index Only Scan using idx_broker_emails_mc_confidence_created, no Sort
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_broker_emails_mc_confidence_created
+    ON webwise.broker_emails (mc_number, confidence DESC, created_at DESC, id DESC)
+    INCLUDE (email);
+
+VACUUM ANALYZE webwise.broker_emails;
@@ -0,0 +1,21 @@
+-- Migration 032: Partial index for active document lookups by scope
+--
+-- document_registry.get_active_documents, upsert_driver_document and
+-- deactivate_active_documents all filter on
+--   driver_id = ? AND doc_type = ? AND is_active = TRUE
+--   AND (negotiation_id IS NULL | negotiation_id = ?)
+-- The NULL / equality forms replace the previous COALESCE(negotiation_id, 0)
+-- comparison, which no index could serve. Keying the partial index on
+-- (driver_id, doc_type, negotiation_id, id DESC) answers both forms and the
+-- "newest first" ORDER BY id DESC without a sort. Only active rows are
+-- indexed, so the index stays small as document history grows.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so this
+-- file intentionally has no BEGIN/COMMIT. Run it with plain psql:
+--   psql "$DATABASE_URL" -f migrations/032_driver_documents_active_scope_index.sql
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_driver_documents_active_scope
+    ON public.driver_documents (driver_id, doc_type, negotiation_id, id DESC)
+    WHERE is_active = TRUE;
+
+ANALYZE public.driver_documents;
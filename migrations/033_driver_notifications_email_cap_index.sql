@@ -0,0 +1,24 @@
+-- Migration 033: Partial index for the hourly email cap count
+--
+-- notification_guard.record_notification counts a driver's recent email-type
+-- notifications in the same statement as the insert:
+--   SELECT COUNT(*) FROM driver_notifications
+--   WHERE driver_id = ? AND created_at >= NOW() - INTERVAL '1 hour'
+--     AND notif_type IN ('LOAD_MATCH', 'AUTO_SENT', 'BROKER_REPLY')
+-- The only existing index (ix_driver_notif_driver_unread) covers unread rows,
+-- so the count walks every notification the driver has ever had. Restricting
+-- the index to the email types and keying it on (driver_id, created_at DESC)
+-- turns the count into an index-only range scan over the last hour's rows.
+--
+-- CREATE INDEX CONCURRENTLY cannot run inside a transaction block, so this
+-- file intentionally has no BEGIN/COMMIT. Run it with plain psql:
+--   psql "$DATABASE_URL" -f migrations/033_driver_notifications_email_cap_index.sql
+--
+-- Verify afterwards with EXPLAIN (ANALYZE) on the query above:
+-- Expect: Index Only Scan using idx_driver_notifications_email_recent
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS idx_driver_notifications_email_recent
+    ON public.driver_notifications (driver_id, created_at DESC)
+    WHERE notif_type IN ('LOAD_MATCH', 'AUTO_SENT', 'BROKER_REPLY');
+
+VACUUM ANALYZE public.driver_notifications;
@@ -0,0 +1,206 @@
+from contextlib import contextmanager
+from datetime import date
+
+from sqlalchemy.dialects import postgresql
+
+from app.repositories import billing_repo
+from app.services import billing
+from app.services.stripe_billing import PaymentIntentResult
+
+
+class _RecordingSession:
+    """Stand-in for a Session: records statements, commits and savepoints."""
+
+    def __init__(self):
+        self.executed = []
+        self.commits = 0
+        self.rollbacks = 0
+        self.savepoint_rollbacks = 0
+
+    def execute(self, statement, params=None):
+        self.executed.append((statement, params))
+
+    def commit(self):
+        self.commits += 1
+
+    def rollback(self):
+        self.rollbacks += 1
+
+    @contextmanager
+    def begin_nested(self):
+        try:
+            yield
+        except Exception:
+            self.savepoint_rollbacks += 1
+            raise
+
+
+def _pi(pi_id, succeeded=True):
+    return PaymentIntentResult(
+        success=succeeded,
+        payment_intent_id=pi_id,
+        error_message=None if succeeded else "card_declined",
+        stripe_status="succeeded" if succeeded else "requires_payment_method",
+    )
+
+
+WEEK_ENDING = date(2026, 10, 9)
+
+
+def _pending(driver_id):
+    return billing_repo.PendingDriverBilling(
+        driver_id=driver_id,
+        invoice_ids=[driver_id * 10],
+        total_cents=driver_id * 1000,
+        driver_info={
+            "id": driver_id,
+            "stripe_customer_id": f"cus_{driver_id}",
+            "stripe_default_payment_method_id": f"pm_{driver_id}",
+            "billing_mode": "paid",
+            "billing_exempt_until": None,
+        },
+        existing_run=None,
+    )
+
+
+def _stub_billing_writes(monkeypatch, calls):
+    monkeypatch.setattr(billing_repo, "get_needs_reconcile_runs", lambda db: [])
+    monkeypatch.setattr(billing_repo, "create_billing_run", lambda db, driver_id, week, cents: driver_id + 100)
+    monkeypatch.setattr(billing_repo, "attach_invoices_to_run", lambda db, run_id, ids, week: None)
+    monkeypatch.setattr(
+        billing_repo, "mark_run_success",
+        lambda db, run_id, pi_id, ids: calls.append(("success", run_id, pi_id)),
+    )
+    monkeypatch.setattr(
+        billing_repo, "mark_run_failed",
+        lambda db, run_id, error, ids: calls.append(("failed", run_id, error)),
+    )
+    monkeypatch.setattr(billing_repo, "set_driver_delinquent", lambda db, driver_id: calls.append(("delinquent", driver_id)))
+    monkeypatch.setattr(
+        billing_repo, "mark_run_needs_reconcile",
+        lambda db, run_id, pi_id: calls.append(("needs_reconcile", run_id, pi_id)),
+    )
+
+
+def _needs_reconcile(monkeypatch, runs, stripe_results):
+    monkeypatch.setattr(billing_repo, "get_needs_reconcile_runs", lambda db: runs)
+    monkeypatch.setattr(billing, "retrieve_payment_intent", lambda pi_id: stripe_results[pi_id])
+
+
+def test_mark_runs_success_binds_array_parameters():
+    db = _RecordingSession()
+    billing_repo.mark_runs_success(db, {11: "pi_a", 12: "pi_b"})
+
+    assert len(db.executed) == 2
+    for statement, params in db.executed:
+        sql = str(statement.compile(dialect=postgresql.dialect()))
+        assert "%(run_ids)s" in sql and "%(pi_ids)s" in sql
+        assert ":run_ids" not in sql and ":pi_ids" not in sql
+        assert params == {"run_ids": [11, 12], "pi_ids": ["pi_a", "pi_b"]}
+
+
+def test_reconcile_settles_succeeded_runs_in_one_batch(monkeypatch):
+    _needs_reconcile(
+        monkeypatch,
+        [
+            {"id": 1, "stripe_payment_intent_id": "pi_1"},
+            {"id": 2, "stripe_payment_intent_id": "pi_2"},
+            {"id": 3, "stripe_payment_intent_id": None},
+        ],
+        {"pi_1": _pi("pi_1"), "pi_2": _pi("pi_2", succeeded=False)},
+    )
+    settled = []
+    monkeypatch.setattr(billing_repo, "mark_runs_success", lambda db, runs: settled.append(dict(runs)))
+
+    db = _RecordingSession()
+    billing._reconcile_pending_runs(db)
+
+    assert settled == [{1: "pi_1"}]
+    assert db.commits == 1
+    assert db.rollbacks == 0
+
+
+def test_reconcile_isolates_a_failing_run(monkeypatch):
+    _needs_reconcile(
+        monkeypatch,
+        [{"id": run_id, "stripe_payment_intent_id": f"pi_{run_id}"} for run_id in (1, 2, 3)],
+        {f"pi_{run_id}": _pi(f"pi_{run_id}") for run_id in (1, 2, 3)},
+    )
+    settled = []
+
+    def mark_runs_success(db, runs):
+        if 2 in runs:
+            raise RuntimeError("constraint violation")
+        settled.extend(runs)
+
+    monkeypatch.setattr(billing_repo, "mark_runs_success", mark_runs_success)
+
+    db = _RecordingSession()
+    billing._reconcile_pending_runs(db)
+
+    assert settled == [1, 3]
+    assert db.rollbacks == 1
+    assert db.savepoint_rollbacks == 1
+    assert db.commits == 1
+
+
+def test_attach_invoices_to_run_binds_array_parameter():
+    db = _RecordingSession()
+    billing_repo.attach_invoices_to_run(db, 7, [1, 2], WEEK_ENDING)
+
+    sql = str(db.executed[0][0].compile(dialect=postgresql.dialect()))
+    assert "%(invoice_ids)s" in sql and ":invoice_ids" not in sql
+
+
+def test_weekly_billing_finalizes_every_charge_when_one_worker_raises(monkeypatch):
+    calls = []
+    _stub_billing_writes(monkeypatch, calls)
+    monkeypatch.setattr(
+        billing_repo, "get_pending_billing_context",
+        lambda db, week: [_pending(1), _pending(2), _pending(3)],
+    )
+
+    def charge(*, customer_id, **kwargs):
+        if customer_id == "cus_1":
+            return _pi("pi_1")
+        if customer_id == "cus_2":
+            raise RuntimeError("connection reset")
+        return _pi(None, succeeded=False)
+
+    monkeypatch.setattr(billing, "create_payment_intent_off_session", charge)
+
+    result = billing.run_weekly_billing(_RecordingSession(), WEEK_ENDING)
+
+    statuses = {r.driver_id: r.status for r in result.driver_results}
+    assert statuses == {1: "success", 2: "charge_error", 3: "failed"}
+    assert result.drivers_succeeded == 1
+    assert result.drivers_failed == 2
+    assert result.total_amount_cents == 1000
+    # Charged driver settled, declined driver failed; the unknown outcome writes nothing
+    assert ("success", 101, "pi_1") in calls
+    assert ("failed", 103, "card_declined") in calls
+    assert ("delinquent", 3) in calls
+    assert not [call for call in calls if call[1] == 102]
+    assert ("delinquent", 2) not in calls
+
+
+def test_finalize_marks_needs_reconcile_when_commit_fails_after_charge(monkeypatch):
+    calls = []
+    _stub_billing_writes(monkeypatch, calls)
+
+    def mark_run_success(db, run_id, pi_id, ids):
+        raise RuntimeError("deadlock detected")
+
+    monkeypatch.setattr(billing_repo, "mark_run_success", mark_run_success)
+    charge = billing.PendingCharge(
+        driver_id=1, run_id=101, invoice_ids=[10], total_cents=1000,
+        customer_id="cus_1", payment_method_id="pm_1",
+    )
+
+    db = _RecordingSession()
+    result = billing._finalize_charge(db, charge, _pi("pi_1"), WEEK_ENDING)
+
+    assert result.status == "needs_reconcile"
+    assert result.stripe_payment_intent_id == "pi_1"
+    assert calls == [("needs_reconcile", 101, "pi_1")]
+    assert db.rollbacks == 1
@@ -0,0 +1,34 @@
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from app.services.billing_gate import maybe_flip_trial_expired, trial_days_remaining
+
+
+class _Session:
+    def __init__(self):
+        self.added = []
+
+    def add(self, obj):
+        self.added.append(obj)
+
+
+def _trial_driver(trial_ends_at):
+    return SimpleNamespace(id=1, billing_status="trial", billing_mode="paid", trial_ends_at=trial_ends_at)
+
+
+def test_naive_trial_end_is_treated_as_utc():
+    naive_future = datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(days=2, hours=1)
+    driver = _trial_driver(naive_future)
+
+    assert trial_days_remaining(driver) == 3
+    assert maybe_flip_trial_expired(driver, _Session()) is False
+
+
+def test_expired_naive_trial_flips_to_card_required():
+    naive_past = datetime.now(timezone.utc).replace(tzinfo=None) - timedelta(minutes=5)
+    driver = _trial_driver(naive_past)
+    db = _Session()
+
+    assert maybe_flip_trial_expired(driver, db) is True
+    assert driver.billing_status == "card_required"
+    assert db.added == [driver]
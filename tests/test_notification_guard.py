@@ -0,0 +1,75 @@
+from types import SimpleNamespace
+
+from sqlalchemy.dialects import postgresql
+
+from app.services.notification_guard import (
+    EMAIL_CAP_PER_HOUR,
+    EMAIL_NOTIF_TYPES,
+    record_notification,
+    should_email,
+)
+
+
+class _Session:
+    def __init__(self, row):
+        self.row = row
+        self.statement = None
+        self.params = None
+        self.committed = False
+
+    def execute(self, statement, params=None):
+        self.statement = statement
+        self.params = params
+        return SimpleNamespace(fetchone=lambda: self.row)
+
+    def commit(self):
+        self.committed = True
+
+    def rollback(self):
+        raise AssertionError("record_notification should not roll back")
+
+
+def _driver(**overrides):
+    fields = {
+        "id": 1,
+        "notif_email_enabled": True,
+        "last_seen_at": None,
+        "notif_quiet_start": None,
+        "notif_quiet_end": None,
+        "timezone": None,
+        "notif_email_digest": False,
+    }
+    fields.update(overrides)
+    return SimpleNamespace(**fields)
+
+
+def test_record_notification_binds_every_parameter():
+    db = _Session(SimpleNamespace(id=42, cnt=1))
+    notif = record_notification(
+        db, driver_id=1, notif_type="AUTO_SENT", message="Bid sent", payload={"load_id": 7}, dedupe_key="k",
+    )
+
+    sql = str(db.statement.compile(dialect=postgresql.dialect()))
+    assert "%(payload)s" in sql and ":payload" not in sql
+    assert db.params["payload"] == '{"load_id":7}'
+    assert "%(email_types)s" in sql
+    assert set(db.params["email_types"]) == EMAIL_NOTIF_TYPES
+    assert db.committed
+    # The snapshot count excludes the new row; it is added back for email types
+    assert notif.inserted and notif.notification_id == 42
+    assert notif.emails_last_hour == 2
+
+
+def test_record_notification_dedupe_hit_keeps_count():
+    db = _Session(SimpleNamespace(id=None, cnt=2))
+    notif = record_notification(db, driver_id=1, notif_type="LOAD_MATCH", message="m", dedupe_key="k")
+
+    assert not notif.inserted
+    assert notif.emails_last_hour == 2
+    assert db.params["payload"] == "{}"
+
+
+def test_should_email_enforces_hourly_cap():
+    driver = _driver()
+    assert should_email(driver, "AUTO_SENT", emails_last_hour=EMAIL_CAP_PER_HOUR - 1)
+    assert not should_email(driver, "AUTO_SENT", emails_last_hour=EMAIL_CAP_PER_HOUR)
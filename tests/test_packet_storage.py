@@ -0,0 +1,65 @@
+from app.services import packet_storage
+from app.services.packet_storage import read_bytes_within_limit
+
+
+class _FakeSpaces:
+    def __init__(self, size, body):
+        self.size = size
+        self.body = body
+        self.gets = 0
+
+    def head_object(self, Bucket, Key):
+        if self.size is None:
+            raise RuntimeError("HEAD not allowed")
+        return {"ContentLength": self.size}
+
+    def get_object(self, Bucket, Key):
+        self.gets += 1
+        return {"Body": _Body(self.body)}
+
+
+class _Body:
+    def __init__(self, data):
+        self.data = data
+
+    def read(self):
+        return self.data
+
+
+def _use_spaces(monkeypatch, client):
+    monkeypatch.setattr(packet_storage, "_spaces_client", lambda: client)
+
+
+def test_local_packet_within_limit_is_read(tmp_path):
+    (tmp_path / "packet.pdf").write_bytes(b"%PDF-1.7 ok")
+
+    data, too_large = read_bytes_within_limit("packet.pdf", max_bytes=1024, local_root=tmp_path)
+
+    assert data == b"%PDF-1.7 ok"
+    assert too_large is False
+
+
+def test_oversized_spaces_packet_is_rejected_without_download(monkeypatch, tmp_path):
+    client = _FakeSpaces(size=2048, body=b"x" * 2048)
+    _use_spaces(monkeypatch, client)
+
+    data, too_large = read_bytes_within_limit("packets/p.pdf", max_bytes=1024, bucket="b", local_root=tmp_path)
+
+    assert data is None and too_large is True
+    assert client.gets == 0
+
+
+def test_size_is_checked_after_download_when_head_fails(monkeypatch, tmp_path):
+    _use_spaces(monkeypatch, _FakeSpaces(size=None, body=b"x" * 2048))
+
+    data, too_large = read_bytes_within_limit("packets/p.pdf", max_bytes=1024, bucket="b", local_root=tmp_path)
+
+    assert data is None and too_large is True
+
+
+def test_missing_packet_is_not_reported_as_too_large(monkeypatch, tmp_path):
+    _use_spaces(monkeypatch, None)
+
+    data, too_large = read_bytes_within_limit("packets/missing.pdf", max_bytes=1024, local_root=tmp_path)
+
+    assert data is None and too_large is False
@@ -6,6 +6,7 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import StaticPool
 
+from app.core.config import settings
 from app.services.ledger import process_load_fees
 
 
@@ -170,3 +171,19 @@ def test_idempotency_remains_intact():
             text("SELECT COUNT(*) AS count_value FROM fee_ledger WHERE negotiation_id = 1004")
         ).scalar_one()
         assert int(ledger_count) == 1
+
+
+def test_patched_fee_rate_is_applied(monkeypatch):
+    SessionLocal = _build_session()
+    monkeypatch.setattr(settings, "DISPATCH_FEE_RATE", 0.05)
+
+    with SessionLocal() as db:
+        db.execute(text("INSERT INTO drivers (id) VALUES (4)"))
+
+        process_load_fees(db, load_value=2000, driver_id=4, negotiation_id=1005)
+        db.commit()
+
+        fee = db.execute(
+            text("SELECT total_fee_collected FROM fee_ledger WHERE negotiation_id = 1005")
+        ).scalar_one()
+        assert Decimal(str(fee)) == Decimal("100.00")
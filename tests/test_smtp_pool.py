@@ -0,0 +1,244 @@
+import smtplib
+import threading
+import time
+
+import pytest
+
+from app.services import smtp_pool as pool_module
+from app.services.smtp_pool import PipelinedSMTP, SmtpPool
+
+
+class _FakeClient:
+    opened = []
+
+    def __init__(self, host, port, timeout=None):
+        self.key = (host, port)
+        self.noop_code = 250
+        self.closed = False
+        self.quit_called = False
+        _FakeClient.opened.append(self)
+
+    def login(self, user, password):
+        if password == "wrong":
+            raise smtplib.SMTPAuthenticationError(535, b"bad credentials")
+
+    def noop(self):
+        return (self.noop_code, b"ok")
+
+    def quit(self):
+        self.quit_called = True
+        self.closed = True
+
+    def close(self):
+        self.closed = True
+
+
+@pytest.fixture
+def fake_smtp(monkeypatch):
+    _FakeClient.opened = []
+    monkeypatch.setattr(pool_module, "PipelinedSMTP", _FakeClient)
+    return _FakeClient.opened
+
+
+def _lease(pool, host="smtp.test", user="dispatch", password="secret"):
+    return pool.get_connection(host, 465, user, password)
+
+
+def test_returned_connection_is_reused(fake_smtp):
+    pool = SmtpPool()
+    first = _lease(pool)
+    pool.return_connection(first)
+
+    assert _lease(pool) is first
+    assert len(fake_smtp) == 1
+
+
+def test_dead_connection_is_replaced(fake_smtp):
+    pool = SmtpPool()
+    first = _lease(pool)
+    pool.return_connection(first)
+    first.noop_code = 421
+
+    second = _lease(pool)
+
+    assert second is not first
+    assert first.closed
+
+
+def test_idle_connection_past_limit_is_replaced(fake_smtp):
+    pool = SmtpPool()
+    first = _lease(pool)
+    pool.return_connection(first)
+    (idle,) = pool._idle.values()
+    idle[0].last_used -= pool_module.MAX_IDLE_SECONDS + 1
+
+    assert _lease(pool) is not first
+    assert first.closed
+
+
+def test_connection_is_recycled_after_max_messages(fake_smtp, monkeypatch):
+    monkeypatch.setattr(pool_module, "MAX_MESSAGES_PER_CONNECTION", 2)
+    pool = SmtpPool()
+
+    client = _lease(pool)
+    pool.return_connection(client)
+    assert _lease(pool) is client
+    pool.return_connection(client)
+
+    assert client.quit_called
+    assert _lease(pool) is not client
+
+
+def test_failed_send_discards_connection(fake_smtp):
+    pool = SmtpPool()
+    with pytest.raises(smtplib.SMTPDataError):
+        with pool.connection("smtp.test", 465, "dispatch", "secret") as client:
+            raise smtplib.SMTPDataError(554, b"rejected")
+
+    assert client.closed
+    assert _lease(pool) is not client
+
+
+def test_open_connections_are_capped(fake_smtp, monkeypatch):
+    monkeypatch.setattr(pool_module, "SMTP_TIMEOUT_SECONDS", 0.05)
+    pool = SmtpPool(max_connections=1)
+    client = _lease(pool)
+
+    with pytest.raises(smtplib.SMTPException, match="exhausted"):
+        _lease(pool)
+    assert len(fake_smtp) == 1
+
+    pool.return_connection(client)
+    assert _lease(pool) is client
+
+
+def test_waiter_gets_connection_when_one_is_returned(fake_smtp):
+    pool = SmtpPool(max_connections=1)
+    client = _lease(pool)
+    leased = []
+    waiter = threading.Thread(target=lambda: leased.append(_lease(pool)))
+    waiter.start()
+
+    time.sleep(0.05)
+    assert not leased
+    pool.return_connection(client)
+    waiter.join(timeout=2)
+
+    assert leased == [client]
+    assert len(fake_smtp) == 1
+
+
+def test_idle_connection_for_other_account_is_evicted_at_cap(fake_smtp):
+    pool = SmtpPool(max_connections=1)
+    other = _lease(pool, user="billing")
+    pool.return_connection(other)
+
+    client = _lease(pool)
+
+    assert client is not other
+    assert other.closed
+
+
+def test_failed_login_releases_its_slot(fake_smtp):
+    pool = SmtpPool(max_connections=1)
+    with pytest.raises(smtplib.SMTPAuthenticationError):
+        _lease(pool, password="wrong")
+
+    assert _lease(pool) is fake_smtp[-1]
+
+
+class _ScriptedSMTP(PipelinedSMTP):
+    """PipelinedSMTP with the socket replaced by a scripted reply list."""
+
+    def __init__(self, replies, features=("pipelining",)):
+        super().__init__()
+        self.esmtp_features = {feature: "" for feature in features}
+        self.does_esmtp = True
+        self.replies = list(replies)
+        self.sent = []
+        self.rsets = 0
+        self.closed = False
+
+    def ehlo_or_helo_if_needed(self):
+        pass
+
+    def send(self, data):
+        self.sent.append(data)
+
+    def getreply(self):
+        return self.replies.pop(0)
+
+    def _rset(self):
+        self.rsets += 1
+
+    def close(self):
+        self.closed = True
+
+
+def test_pipelined_envelope_goes_out_in_one_write():
+    client = _ScriptedSMTP([(250, b"ok"), (250, b"ok"), (354, b"go"), (250, b"queued")])
+
+    refused = client.sendmail("dispatch@x.test", ["broker@y.test"], "Subject: hi\n\n.dot line\n")
+
+    assert refused == {}
+    assert client.sent[0] == "mail FROM:<dispatch@x.test>\r\nrcpt TO:<broker@y.test>\r\ndata\r\n"
+    assert client.sent[1] == b"Subject: hi\r\n\r\n..dot line\r\n.\r\n"
+    assert not client.replies
+
+
+def test_pipelined_partial_recipient_refusal_still_sends():
+    client = _ScriptedSMTP([(250, b"ok"), (550, b"no such user"), (250, b"ok"), (354, b"go"), (250, b"queued")])
+
+    refused = client.sendmail("dispatch@x.test", ["gone@y.test", "broker@y.test"], "body")
+
+    assert refused == {"gone@y.test": (550, b"no such user")}
+    assert client.rsets == 0
+
+
+def test_pipelined_sender_refused_resets():
+    client = _ScriptedSMTP([(550, b"sender rejected"), (503, b"need mail"), (503, b"need rcpt")])
+
+    with pytest.raises(smtplib.SMTPSenderRefused):
+        client.sendmail("dispatch@x.test", ["broker@y.test"], "body")
+
+    assert client.rsets == 1
+    assert len(client.sent) == 1
+
+
+def test_pipelined_all_recipients_refused_closes_open_data():
+    client = _ScriptedSMTP([(250, b"ok"), (550, b"no such user"), (354, b"go"), (554, b"no valid recipients")])
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        client.sendmail("dispatch@x.test", ["gone@y.test"], "body")
+
+    assert client.sent[1] == ".\r\n"
+    assert client.rsets == 1
+
+
+def test_pipelined_421_closes_connection():
+    client = _ScriptedSMTP([(250, b"ok"), (421, b"shutting down"), (421, b"shutting down")])
+
+    with pytest.raises(smtplib.SMTPRecipientsRefused):
+        client.sendmail("dispatch@x.test", ["broker@y.test"], "body")
+
+    assert client.closed
+
+
+def test_data_rejection_after_pipelined_envelope_resets():
+    client = _ScriptedSMTP([(250, b"ok"), (250, b"ok"), (354, b"go"), (552, b"too big")])
+
+    with pytest.raises(smtplib.SMTPDataError):
+        client.sendmail("dispatch@x.test", ["broker@y.test"], "body")
+
+    assert client.rsets == 1
+
+
+def test_without_pipelining_falls_back_to_smtplib(monkeypatch):
+    calls = []
+    monkeypatch.setattr(smtplib.SMTP, "sendmail", lambda self, *args: calls.append(args) or {})
+    client = _ScriptedSMTP([], features=())
+
+    client.sendmail("dispatch@x.test", ["broker@y.test"], "body")
+
+    assert len(calls) == 1
+    assert client.sent == []